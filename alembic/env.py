@@ -9,6 +9,7 @@ from alembic import context
 
 from src.config import settings
 from src.models import Base
+from src.partitions import PARTITION_NAME, DEFAULT_PARTITION
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -57,8 +58,15 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def include_object(object_, name, type_, reflected, compare_to) -> bool:
+    # Partitions of reservations are managed by src.partitions, autogenerate must not drop them
+    if type_ == "table" and reflected and compare_to is None:
+        return not (name == DEFAULT_PARTITION or PARTITION_NAME.match(name))
+    return True
+
+
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,105 @@
+"""partition reservations by month
+
+Revision ID: 2c6f4a8e1d57
+Revises: 7d0c3b92e6f5
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+import datetime as dt
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c6f4a8e1d57'
+down_revision: Union[str, None] = '7d0c3b92e6f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Later months are created by src.partitions
+MONTHS_AHEAD = 12
+COLUMNS = "id, start_datetime, duration_in_minutes, user_id, food_table_id"
+
+
+def add_months(month: dt.date, months: int) -> dt.date:
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return dt.date(year, month_index + 1, 1)
+
+
+def reservation_columns() -> list[sa.Column]:
+    return [
+        sa.Column("id", sa.Integer(), server_default=sa.text("nextval('reservations_id_seq'::regclass)"),
+                  nullable=False),
+        sa.Column("start_datetime", sa.DateTime(), nullable=False),
+        sa.Column("duration_in_minutes", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("food_table_id", sa.Integer(), sa.ForeignKey("food_tables.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("during", postgresql.TSRANGE(), sa.Computed(
+            "tsrange(start_datetime, start_datetime + duration_in_minutes * interval '1 minute')", persisted=True),
+                  nullable=False),
+        sa.CheckConstraint("30 <= duration_in_minutes and duration_in_minutes <= 240", name="check_duration_range"),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE reservations RENAME TO reservations_unpartitioned")
+    op.execute("ALTER TABLE reservations_unpartitioned RENAME CONSTRAINT reservations_pkey "
+               "TO reservations_unpartitioned_pkey")
+    op.drop_constraint("exclude_overlapping_reservations", "reservations_unpartitioned")
+
+    op.create_table("reservations", *reservation_columns(),
+                    sa.PrimaryKeyConstraint("id", "start_datetime", name="reservations_pkey"),
+                    postgresql_partition_by="RANGE (start_datetime)")
+    op.execute("ALTER SEQUENCE reservations_id_seq OWNED BY reservations.id")
+    op.create_index("ix_reservations_user_id_id", "reservations", ["user_id", "id"])
+
+    first = op.get_bind().scalar(sa.text("SELECT min(start_datetime) FROM reservations_unpartitioned"))
+    current = dt.date.today().replace(day=1)
+    month = min(first.date().replace(day=1), current) if first else current
+    partitions = ["reservations_default"]
+    op.execute("CREATE TABLE reservations_default PARTITION OF reservations DEFAULT")
+    while month <= add_months(current, MONTHS_AHEAD):
+        name = f"reservations_y{month.year:04d}m{month.month:02d}"
+        op.execute(f"CREATE TABLE {name} PARTITION OF reservations "
+                   f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')")
+        partitions.append(name)
+        month = add_months(month, 1)
+    op.execute(f"INSERT INTO reservations ({COLUMNS}) SELECT {COLUMNS} FROM reservations_unpartitioned")
+    # A partitioned table cannot enforce an exclusion constraint without the partition key, each partition does
+    for name in partitions:
+        op.execute(f"ALTER TABLE {name} ADD CONSTRAINT {name}_exclude_overlapping "
+                   f"EXCLUDE USING gist (food_table_id WITH =, during WITH &&)")
+    op.drop_table("reservations_unpartitioned")
+
+    op.create_table(
+        "reservations_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("start_datetime", sa.DateTime(), nullable=False),
+        sa.Column("duration_in_minutes", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("food_table_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_reservations_archive_user_id", "reservations_archive", ["user_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE reservations RENAME TO reservations_partitioned")
+    op.execute("ALTER TABLE reservations_partitioned RENAME CONSTRAINT reservations_pkey "
+               "TO reservations_partitioned_pkey")
+    op.execute("ALTER INDEX ix_reservations_user_id_id RENAME TO ix_reservations_partitioned_user_id_id")
+    op.create_table("reservations", *reservation_columns(), sa.PrimaryKeyConstraint("id", name="reservations_pkey"))
+    op.execute("ALTER SEQUENCE reservations_id_seq OWNED BY reservations.id")
+    # Archived reservations overlap nothing booked later, so they go back as they are
+    op.execute(f"INSERT INTO reservations ({COLUMNS}) SELECT {COLUMNS} FROM reservations_partitioned "
+               f"UNION ALL SELECT {COLUMNS} FROM reservations_archive")
+    op.create_exclude_constraint("exclude_overlapping_reservations", "reservations",
+                                 ("food_table_id", "="), ("during", "&&"), using="gist")
+    op.drop_table("reservations_partitioned")
+    op.drop_index("ix_reservations_archive_user_id", table_name="reservations_archive")
+    op.drop_table("reservations_archive")
@@ -0,0 +1,40 @@
+"""reservation overlap exclusion
+
+Revision ID: 3f1c2a9d7b10
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.add_column("reservations", sa.Column(
+        "during", postgresql.TSRANGE(),
+        sa.Computed("tsrange(start_datetime, start_datetime + duration_in_minutes * interval '1 minute')",
+                    persisted=True),
+        nullable=False))
+    op.create_check_constraint("check_duration_range", "reservations",
+                               "30 <= duration_in_minutes and duration_in_minutes <= 240")
+    op.create_exclude_constraint("exclude_overlapping_reservations", "reservations",
+                                 ("food_table_id", "="), ("during", "&&"), using="gist")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("exclude_overlapping_reservations", "reservations")
+    op.drop_constraint("check_duration_range", "reservations")
+    op.drop_column("reservations", "during")
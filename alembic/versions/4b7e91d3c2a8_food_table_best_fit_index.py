@@ -0,0 +1,28 @@
+"""food table best fit index
+
+Revision ID: 4b7e91d3c2a8
+Revises: c5d2e8a41f07
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e91d3c2a8'
+down_revision: Union[str, None] = 'c5d2e8a41f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("food_place_id_max_seats_index", "food_tables", ["food_place_id", "max_seats"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("food_place_id_max_seats_index", table_name="food_tables")
@@ -0,0 +1,52 @@
+"""catalog search
+
+Revision ID: 7d0c3b92e6f5
+Revises: e93a6f0b5d14
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d0c3b92e6f5'
+down_revision: Union[str, None] = 'e93a6f0b5d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column("food_places", sa.Column(
+        "search_vector", postgresql.TSVECTOR(),
+        sa.Computed("setweight(to_tsvector('simple', name), 'A') || "
+                    "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+                    "setweight(to_tsvector('simple', address), 'C')", persisted=True)))
+    op.add_column("menu_items", sa.Column(
+        "search_vector", postgresql.TSVECTOR(),
+        sa.Computed("setweight(to_tsvector('simple', name), 'A') || "
+                    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')", persisted=True)))
+    # Prefix queries are planned from the most common lexemes; a longer list keeps rare prefixes on the index
+    op.execute("ALTER TABLE food_places ALTER COLUMN search_vector SET STATISTICS 1000")
+    op.execute("ALTER TABLE menu_items ALTER COLUMN search_vector SET STATISTICS 1000")
+    op.create_index("food_places_search_vector_index", "food_places", ["search_vector"], postgresql_using="gin")
+    op.create_index("food_places_name_trgm_index", "food_places", ["name"], postgresql_using="gin",
+                    postgresql_ops={"name": "gin_trgm_ops"})
+    op.create_index("menu_items_search_vector_index", "menu_items", ["search_vector"], postgresql_using="gin")
+    op.create_index("menu_items_name_trgm_index", "menu_items", ["name"], postgresql_using="gin",
+                    postgresql_ops={"name": "gin_trgm_ops"})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("menu_items_name_trgm_index", table_name="menu_items")
+    op.drop_index("menu_items_search_vector_index", table_name="menu_items")
+    op.drop_index("food_places_name_trgm_index", table_name="food_places")
+    op.drop_index("food_places_search_vector_index", table_name="food_places")
+    op.drop_column("menu_items", "search_vector")
+    op.drop_column("food_places", "search_vector")
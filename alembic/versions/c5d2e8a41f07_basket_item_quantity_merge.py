@@ -0,0 +1,45 @@
+"""basket item quantity merge
+
+Revision ID: c5d2e8a41f07
+Revises: 8a4e0c6f2d31
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2e8a41f07'
+down_revision: Union[str, None] = '8a4e0c6f2d31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fold duplicate rows of the same menu item into the oldest one before adding the unique key
+    op.execute("""
+        UPDATE basket_items SET item_quantity = merged.item_quantity
+        FROM (SELECT min(id) AS id, sum(item_quantity) AS item_quantity FROM basket_items
+              GROUP BY food_basket_id, menu_item_id HAVING count(*) > 1) AS merged
+        WHERE basket_items.id = merged.id
+    """)
+    op.execute("""
+        DELETE FROM basket_items USING basket_items AS kept
+        WHERE basket_items.food_basket_id = kept.food_basket_id AND basket_items.menu_item_id = kept.menu_item_id
+          AND basket_items.id > kept.id
+    """)
+    op.create_unique_constraint("unique_menu_item_in_food_basket", "basket_items",
+                                ["food_basket_id", "menu_item_id"])
+    op.create_check_constraint("check_item_quantity_positive", "basket_items", "item_quantity > 0")
+    op.drop_index("ix_basket_items_food_basket_id", table_name="basket_items")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_basket_items_food_basket_id", "basket_items", ["food_basket_id"])
+    op.drop_constraint("check_item_quantity_positive", "basket_items", type_="check")
+    op.drop_constraint("unique_menu_item_in_food_basket", "basket_items", type_="unique")
@@ -0,0 +1,28 @@
+"""food place location index
+
+Revision ID: e93a6f0b5d14
+Revises: 4b7e91d3c2a8
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e93a6f0b5d14'
+down_revision: Union[str, None] = '4b7e91d3c2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_food_places_location_id", "food_places", ["location_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_food_places_location_id", table_name="food_places")
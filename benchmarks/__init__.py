@@ -0,0 +1,7 @@
+"""Load tests for the hot routes, driven in-process against the database configured in .env.
+
+    python -m benchmarks run --requests 500 --concurrency 20 --output results.json
+    python -m benchmarks compare baseline.json results.json
+
+Every run seeds its own location, food place, tables and users, so it can be pointed at a shared dev database.
+"""
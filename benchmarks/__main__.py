@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import datetime as dt
+import json
+import platform
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.scenarios import SCENARIOS, BenchContext
+from src.config import settings
+from src.main import app
+
+COMPARED = (("throughput_rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False))
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    # All requests come from a few users on one address, limiting them would measure the rate limits
+    settings.RATE_LIMIT_ENABLED = False
+    ctx = BenchContext(args.concurrency, args.seed)
+    results = {}
+    async with app.router.lifespan_context(app):
+        try:
+            await ctx.setup()
+            for name in args.scenarios:
+                results[name] = (await SCENARIOS[name](ctx, args.requests)).summary()
+                print_summary(name, results[name])
+        finally:
+            await ctx.close()
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+
+def print_summary(name: str, summary: dict):
+    print(f"{name:<10} {summary['requests']:>6} req  {summary['throughput_rps']:>8.1f} rps  "
+          f"p50 {summary['p50_ms']:>8.1f} ms  p95 {summary['p95_ms']:>8.1f} ms  p99 {summary['p99_ms']:>8.1f} ms  "
+          f"errors {summary['errors']}  statuses {summary['statuses']}")
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> bool:
+    """Prints relative changes and returns False if any metric got worse by more than ``tolerance``."""
+    ok = True
+    for name, summary in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            print(f"{name:<10} not in baseline")
+            continue
+        for metric, higher_is_better in COMPARED:
+            before, after = base[metric], summary[metric]
+            change = (after - before) / before if before else 0.0
+            regressed = (-change if higher_is_better else change) > tolerance
+            ok &= not regressed
+            print(f"{name:<10} {metric:<15} {before:>10.1f} -> {after:>10.1f}  {change:+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run scenarios against the configured database")
+    run_parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                            help=f"any of {', '.join(SCENARIOS)}, all by default")
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    run_parser.add_argument("--concurrency", type=int, default=10)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", type=Path, help="write results as JSON")
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        unknown = set(args.scenarios) - set(SCENARIOS)
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        args.scenarios = args.scenarios or list(SCENARIOS)
+        results = asyncio.run(run(args))
+        if args.output:
+            args.output.write_text(json.dumps(results, indent=2))
+    else:
+        ok = compare(json.loads(args.baseline.read_text()), json.loads(args.current.read_text()), args.tolerance)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
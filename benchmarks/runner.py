@@ -0,0 +1,62 @@
+import asyncio
+import collections
+import math
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+
+class ScenarioResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.statuses = collections.Counter()
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def record(self, latency: float, status_code: int, ok: bool):
+        self.latencies.append(latency)
+        self.statuses[status_code] += 1
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    def summary(self) -> dict:
+        count = len(self.latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "elapsed_seconds": self.elapsed,
+            "throughput_rps": count / self.elapsed if self.elapsed else 0.0,
+            "mean_ms": sum(self.latencies) / count * 1000 if count else 0.0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": max(self.latencies, default=0.0) * 1000,
+            "statuses": {str(status_code): count for status_code, count in sorted(self.statuses.items())},
+        }
+
+
+async def run_load(name: str, operation: Callable[[int, int], Awaitable[httpx.Response]], total: int,
+                   concurrency: int, ok_statuses: set[int]) -> ScenarioResult:
+    """Runs ``operation(worker, index)`` ``total`` times from ``concurrency`` workers."""
+    result = ScenarioResult(name)
+    indexes = iter(range(total))
+
+    async def worker(worker_index: int):
+        for index in indexes:
+            started = time.perf_counter()
+            response = await operation(worker_index, index)
+            result.record(time.perf_counter() - started, response.status_code, response.status_code in ok_statuses)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_index) for worker_index in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
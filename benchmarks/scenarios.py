@@ -0,0 +1,132 @@
+import datetime as dt
+import random
+import uuid
+
+import httpx
+from sqlalchemy import update
+
+from benchmarks.runner import ScenarioResult, run_load
+from src.database import engine
+from src.main import app
+from src.models import User
+
+PASSWORD = "benchmark-password"
+
+
+class BenchContext:
+    """Seeded data of one run: an admin, a food place with a few hot tables, menu items and one user per worker."""
+
+    def __init__(self, concurrency: int, seed: int):
+        self.run_id = uuid.uuid4().hex[:8]
+        self.concurrency = concurrency
+        self.random = random.Random(seed)
+        self.admin: httpx.AsyncClient | None = None
+        self.users: list[httpx.AsyncClient] = []
+        self.user_names: list[str] = []
+        self.food_place_id: int | None = None
+        self.food_table_ids: list[int] = []
+        self.menu_item_ids: list[int] = []
+        self.booking_date = dt.date.today() + dt.timedelta(days=30)
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark/api")
+
+    async def register(self, name: str) -> httpx.AsyncClient:
+        client = self.client()
+        response = await client.post("/auth/register", json={"name": name, "password": PASSWORD})
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        return client
+
+    async def setup(self):
+        admin_name = f"bench-admin-{self.run_id}"
+        self.admin = await self.register(admin_name)
+        async with engine.begin() as connection:
+            await connection.execute(update(User).where(User.name == admin_name).values(is_admin=True))
+        response = await self.admin.post("/auth/login", data={"username": admin_name, "password": PASSWORD})
+        self.admin.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        location = (await self.admin.post("/locations", json={"name": f"bench-{self.run_id}"})).json()
+        food_place = (await self.admin.post("/food_places", json={
+            "name": f"bench-{self.run_id}", "address": "Benchmark street", "description": "Benchmark place",
+            "location_id": location["id"], "open_time": "10:00", "close_time": "22:00"})).json()
+        self.food_place_id = food_place["id"]
+        for number, seats in enumerate((2, 2, 4, 4, 6), start=1):
+            food_table = (await self.admin.post("/food_tables", json={
+                "table_number": str(number), "max_seats": seats, "food_place_id": self.food_place_id})).json()
+            self.food_table_ids.append(food_table["id"])
+        for number in range(10):
+            menu_item = (await self.admin.post("/menu_items", json={
+                "name": f"dish {number}", "price": 100 + number, "food_place_id": self.food_place_id})).json()
+            self.menu_item_ids.append(menu_item["id"])
+
+        for number in range(self.concurrency):
+            name = f"bench-user-{self.run_id}-{number}"
+            self.user_names.append(name)
+            self.users.append(await self.register(name))
+
+    async def close(self):
+        for client in [self.admin, *self.users]:
+            if client is not None:
+                await client.aclose()
+
+
+async def booking(ctx: BenchContext, total: int) -> ScenarioResult:
+    """Concurrent bookings against a few hot tables; a rejected taken slot (400/409) is an expected outcome."""
+
+    async def operation(worker: int, index: int):
+        start_datetime = dt.datetime.combine(ctx.booking_date, dt.time(10)) + dt.timedelta(
+            minutes=15 * ctx.random.randrange(0, 40))
+        return await ctx.users[worker].post("/reservations", json={
+            "start_datetime": start_datetime.strftime("%d.%m.%Y %H:%M"), "duration_in_minutes": 60,
+            "food_table_id": ctx.random.choice(ctx.food_table_ids[:3])})
+
+    return await run_load("booking", operation, total, ctx.concurrency, {200, 400, 409})
+
+
+async def catalog(ctx: BenchContext, total: int) -> ScenarioResult:
+    """Browsing: place list, place, menu and availability of the day."""
+    paths = [
+        ("/food_places", {}),
+        (f"/food_places/{ctx.food_place_id}", {}),
+        (f"/food_places/{ctx.food_place_id}/menu_items", {}),
+        (f"/food_places/{ctx.food_place_id}/availability",
+         {"date": ctx.booking_date.isoformat(), "duration": 60, "seats": 2}),
+    ]
+
+    async def operation(worker: int, index: int):
+        path, params = paths[index % len(paths)]
+        return await ctx.users[worker].get(path, params=params)
+
+    return await run_load("catalog", operation, total, ctx.concurrency, {200})
+
+
+async def login(ctx: BenchContext, total: int) -> ScenarioResult:
+    """Login bursts; 503 from the bounded hashing pool counts as an error."""
+
+    async def operation(worker: int, index: int):
+        return await ctx.users[worker].post("/auth/login", data={"username": ctx.user_names[worker],
+                                                                 "password": PASSWORD})
+
+    return await run_load("login", operation, total, ctx.concurrency, {200})
+
+
+async def checkout(ctx: BenchContext, total: int) -> ScenarioResult:
+    """Put a menu item into a basket and order it; both requests are timed as one operation."""
+
+    async def operation(worker: int, index: int):
+        client = ctx.users[worker]
+        response = await client.post(f"/menu_items/{ctx.random.choice(ctx.menu_item_ids)}/food_baskets")
+        if response.status_code != 200:
+            return response
+        return await client.post(f"/food_baskets/{response.json()['food_basket_id']}")
+
+    return await run_load("checkout", operation, total, ctx.concurrency, {200})
+
+
+SCENARIOS = {
+    "booking": booking,
+    "catalog": catalog,
+    "login": login,
+    "checkout": checkout,
+}
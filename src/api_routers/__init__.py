@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
-from src.api_routers import auth, user, reservation, food_table, food_place, location, food_basket, menu_item
+from src.api_routers import (auth, user, reservation, food_table, food_place, location, food_basket, menu_item,
+                             search, internal)
 
 api_router = APIRouter(prefix="/api")
 api_router.include_router(auth.router)
@@ -12,5 +13,8 @@ api_router.include_router(food_table.router)
 api_router.include_router(reservation.router)
 api_router.include_router(food_basket.router)
 api_router.include_router(menu_item.router)
+api_router.include_router(search.router)
+
+api_router.include_router(internal.router)
 
 
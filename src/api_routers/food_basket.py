@@ -1,63 +1,111 @@
-from fastapi import APIRouter, HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, status, Query
+from pydantic import Field
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config import BaseSchema
-from src.database import db_dep
+from src.database import db_dep, read_db_dep
+from src.idempotency import idempotent
 from src.models import MenuItem, FoodBasket, BasketItem
-from src.schemas.basket_item import CreateBasketItemSchema, BasketItemSchema
-from src.schemas.food_basket import FoodBasketSchema, ItemsFoodBasketSchema
-from src.schemas.menu_item import CreateMenuItemSchema, MenuItemSchema
+from src.orders import enqueue_order
+from src.outbox import outbox_worker
+from src.pagination import page_dep, paginate, stream_ndjson
+from src.schemas.basket_item import BasketItemSchema, BasketLineSchema
+from src.schemas.food_basket import FoodBasketSchema, FoodBasketSummarySchema
 from src.security import actual_user_id_dep
+from src.serialization import schema_columns, list_response, validate_rows
 
 router = APIRouter(prefix="/food_baskets", tags=["FoodBasket"])
 
 
 @router.get("")
-async def list_user_baskets(session: db_dep, user_id: actual_user_id_dep):
-    food_stmt = select(FoodBasket).where(FoodBasket.user_id == user_id)
-    food_baskets = await session.scalars(food_stmt)
-    return [FoodBasketSchema.model_validate(food_basket) for food_basket in food_baskets]
+async def list_user_baskets(session: read_db_dep, user_id: actual_user_id_dep, page: page_dep):
+    food_stmt = paginate(select(*schema_columns(FoodBasket, FoodBasketSchema)).where(FoodBasket.user_id == user_id),
+                         FoodBasket.id, page)
+    if page.stream:
+        return stream_ndjson(food_stmt, FoodBasketSchema, session)
+    return list_response(FoodBasketSchema, await session.execute(food_stmt))
 
 
 @router.get("/{food_basket_id}/basket_items")
-async def list_food_basket_items(food_basket_id: int, session: db_dep, user_id: actual_user_id_dep):
-    food_basket = await session.scalar(
-        select(FoodBasket).options(selectinload(FoodBasket.basket_items)).where(FoodBasket.id == food_basket_id))
+async def list_food_basket_items(food_basket_id: int, session: read_db_dep, user_id: actual_user_id_dep,
+                                 page: page_dep):
+    food_basket = await session.get(FoodBasket, food_basket_id)
     if not food_basket or food_basket.user_id != user_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodBasket not found")
-    return [BasketItemSchema.model_validate(basket_item) for basket_item in food_basket.basket_items]
+    request = paginate(select(*schema_columns(BasketItem, BasketItemSchema)).where(
+        BasketItem.food_basket_id == food_basket_id), BasketItem.id, page)
+    if page.stream:
+        return stream_ndjson(request, BasketItemSchema, session)
+    return list_response(BasketItemSchema, await session.execute(request))
 
 
 class IdMenuItemSchema(BaseSchema):
     menu_item_id: int
+    item_quantity: Annotated[int, Field(default=1, ge=1)]
+
+
+async def add_to_open_basket(session: AsyncSession, user_id: int, menu_item_id: int,
+                             item_quantity: int) -> BasketItem:
+    food_place_id = await session.scalar(select(MenuItem.food_place_id).where(MenuItem.id == menu_item_id))
+    if food_place_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found")
+    food_basket_id = await FoodBasket.open_basket_id(session, user_id, food_place_id)
+    return await BasketItem.add(session, food_basket_id, menu_item_id, item_quantity)
 
 
 @router.post("")
+@idempotent
 async def add_menu_item(menu_item_schema: IdMenuItemSchema, session: db_dep,
                         user_id: actual_user_id_dep) -> BasketItemSchema:
-    menu_item = await session.get(MenuItem, menu_item_schema.menu_item_id)
-    if not menu_item:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found")
-    menu_item_schema = MenuItemSchema.model_validate(menu_item)
-    food_basket_stmt = select(FoodBasket).options(selectinload(FoodBasket.basket_items)).where(
-        FoodBasket.user_id == user_id, FoodBasket.food_place_id == menu_item_schema.food_place_id,
-        FoodBasket.is_ordered == False)
-    food_basket = await session.scalar(food_basket_stmt)
-    if not food_basket:
-        food_basket = FoodBasket(food_place_id=menu_item_schema.food_place_id, user_id=user_id)
-        await session.add(food_basket)
-        await session.refresh(food_basket)
-    basket_item_schema = CreateBasketItemSchema(food_basket_id=food_basket.id,
-                                                menu_item_id=menu_item_schema.id)
-    basket_item = BasketItem(**basket_item_schema.model_dump())
-    session.add(basket_item)
-    session.commit()
-    session.refresh(basket_item)
-    return BasketItemSchema.model_validate(basket_item)
+    basket_item = await add_to_open_basket(session, user_id, menu_item_schema.menu_item_id,
+                                           menu_item_schema.item_quantity)
+    basket_item_schema = BasketItemSchema.model_validate(basket_item)
+    await session.commit()
+    return basket_item_schema
+
+
+@router.delete("/{food_basket_id}/basket_items/{menu_item_id}")
+async def remove_menu_item(food_basket_id: int, menu_item_id: int, session: db_dep, user_id: actual_user_id_dep,
+                           item_quantity: Annotated[int | None, Query(ge=1)] = None):
+    is_ordered = await session.scalar(select(FoodBasket.is_ordered).where(FoodBasket.id == food_basket_id,
+                                                                          FoodBasket.user_id == user_id))
+    if is_ordered is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodBasket not found")
+    if is_ordered:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="FoodBasket already ordered")
+    remaining = await BasketItem.remove(session, food_basket_id, menu_item_id, item_quantity)
+    if remaining is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found in FoodBasket")
+    await session.commit()
+    return {"detail": "Menu item removed from FoodBasket", "item_quantity": remaining}
+
+
+@router.get("/{food_basket_id}/summary")
+async def get_food_basket_summary(food_basket_id: int, session: read_db_dep,
+                                  user_id: actual_user_id_dep) -> FoodBasketSummarySchema:
+    line_total = MenuItem.price * BasketItem.item_quantity
+    stmt = select(
+        FoodBasket.id, FoodBasket.ordered_at, FoodBasket.is_ordered, FoodBasket.food_place_id,
+        BasketItem.menu_item_id, MenuItem.name, MenuItem.price, BasketItem.item_quantity,
+        line_total.label("line_total"), func.coalesce(func.sum(line_total).over(), 0).label("total")
+    ).select_from(FoodBasket).outerjoin(BasketItem, BasketItem.food_basket_id == FoodBasket.id).outerjoin(
+        MenuItem, MenuItem.id == BasketItem.menu_item_id
+    ).where(FoodBasket.id == food_basket_id, FoodBasket.user_id == user_id).order_by(MenuItem.name)
+    rows = (await session.execute(stmt)).all()
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodBasket not found")
+    basket = rows[0]
+    return FoodBasketSummarySchema(
+        id=basket.id, ordered_at=basket.ordered_at, is_ordered=basket.is_ordered, food_place_id=basket.food_place_id,
+        items=validate_rows(BasketLineSchema, (row for row in rows if row.menu_item_id is not None)),
+        total=basket.total)
 
 
 @router.post("/{basket_id}")
+@idempotent
 async def order_basket(basket_id: int, session: db_dep, user_id: actual_user_id_dep):
     food_basket = await session.get(FoodBasket, basket_id)
     if not food_basket or food_basket.user_id != user_id:
@@ -65,5 +113,7 @@ async def order_basket(basket_id: int, session: db_dep, user_id: actual_user_id_
     if food_basket.is_ordered:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="FoodBasket already ordered")
     food_basket.mark_ordered()
+    await enqueue_order(session, food_basket)
     await session.commit()
+    outbox_worker.wake()
     return {"detail": "FoodBasket ordered"}
@@ -1,25 +1,47 @@
-from fastapi import APIRouter, HTTPException, status
+import datetime as dt
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, status, Query, Request, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 
-from src.database import db_dep
-from src.models import FoodPlace, Location, MenuItem
+from src.availability import load_schedules
+from src.config import settings
+from src.database import db_dep, read_db_dep
+from src.events import availability_stream, publish_reservation_events
+from src.idempotency import idempotent
+from src.menu_import import CSV_CONTENT_TYPES, NDJSON_CONTENT_TYPES, import_menu_items, iter_csv, iter_ndjson
+from src.models import FoodPlace, Location, MenuItem, FoodTable, Reservation
+from src.models.reservation import MIN_DURATION_IN_MINUTES, MAX_DURATION_IN_MINUTES, BookingStatus
+from src.pagination import page_dep, paginate, stream_ndjson
+from src.rate_limit import rate_limit
+from src.response_cache import cached_responder_dep, response_cache
+from src.schemas.availability import AvailabilitySchema, TableAvailabilitySchema
 from src.schemas.food_place import FoodPlaceSchema, CreateFoodPlaceSchema, UpdateFoodPlaceSchema
 from src.schemas.menu_item import MenuItemSchema
+from src.schemas.reservation import AutoCreateReservationSchema, ReservationSchema
 from src.security import actual_user_id_dep, only_admin_dep
+from src.serialization import schema_columns, validate_rows
+from src.utils import working_window, in_working_time
 
 router = APIRouter(prefix="/food_places", tags=["FoodPlaces"])
 
 
 @router.get("")
-async def list_food_places(session: db_dep, user_id: actual_user_id_dep):
-    request = select(FoodPlace)
-    response = await session.execute(request)
-    food_places = [FoodPlaceSchema.model_validate(food_place) for food_place in response.scalars().all()]
-    return food_places
+async def list_food_places(session: db_dep, user_id: actual_user_id_dep, page: page_dep,
+                           cached_responder: cached_responder_dep):
+    request = paginate(select(*schema_columns(FoodPlace, FoodPlaceSchema)), FoodPlace.id, page)
+    if page.stream:
+        return stream_ndjson(request, FoodPlaceSchema, session)
+
+    async def build():
+        return validate_rows(FoodPlaceSchema, await session.execute(request))
+
+    return await cached_responder.respond(["food_places"], build)
 
 
 @router.get("/{food_place_id}")
-async def get_food_place(food_place_id: int, session: db_dep, user_id: actual_user_id_dep):
+async def get_food_place(food_place_id: int, session: read_db_dep, user_id: actual_user_id_dep):
     food_place = await session.get(FoodPlace, food_place_id)
     if food_place is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
@@ -40,6 +62,7 @@ async def create_food_place(food_place_schema: CreateFoodPlaceSchema, session: d
     food_place = FoodPlace(**food_place_schema.model_dump())
     session.add(food_place)
     await session.commit()
+    response_cache.invalidate("food_places")
     await session.refresh(food_place)
     return FoodPlaceSchema.model_validate(food_place)
 
@@ -59,6 +82,7 @@ async def update_food_place(food_place_id: int, food_place_schema: UpdateFoodPla
     for attr, value in food_place_schema.model_dump().items():
         setattr(food_place, attr, value)
     await session.commit()
+    response_cache.invalidate("food_places")
     await session.refresh(food_place)
     return FoodPlaceSchema.model_validate(food_place)
 
@@ -70,14 +94,109 @@ async def delete_food_place(food_place_id: int, session: db_dep, user_id: only_a
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodPlace not found")
     await session.delete(food_place)
     await session.commit()
+    response_cache.invalidate("food_places", f"food_place:{food_place_id}", f"food_place:{food_place_id}:menu_items")
     return {"detail": "FoodPlace deleted"}
 
 
 @router.get("/{food_place_id}/menu_items")
-async def list_food_place_menu_items(food_place_id: int, session: db_dep, user_id: actual_user_id_dep) -> list[MenuItemSchema]:
+async def list_food_place_menu_items(food_place_id: int, session: db_dep, user_id: actual_user_id_dep,
+                                     page: page_dep, cached_responder: cached_responder_dep) -> list[MenuItemSchema]:
+    request = paginate(select(*schema_columns(MenuItem, MenuItemSchema)).where(MenuItem.food_place_id == food_place_id),
+                       MenuItem.id, page)
+
+    async def build():
+        food_place = await session.get(FoodPlace, food_place_id)
+        if not food_place:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodPlace not found")
+        if page.stream:
+            return stream_ndjson(request, MenuItemSchema, session)
+        return validate_rows(MenuItemSchema, await session.execute(request))
+
+    if page.stream:
+        return await build()
+    return await cached_responder.respond([f"food_place:{food_place_id}:menu_items"], build)
+
+
+@router.post("/{food_place_id}/menu_items/import")
+@rate_limit("bulk", low_priority=True)
+async def import_food_place_menu_items(food_place_id: int, request: Request, session: db_dep,
+                                       user_id: only_admin_dep):
+    """Upsert menu items from a CSV (with a header line) or NDJSON request body, sent as text/csv or
+    application/x-ndjson. Valid rows are imported, invalid ones are reported by row number."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in CSV_CONTENT_TYPES:
+        rows = iter_csv(request.stream())
+    elif content_type in NDJSON_CONTENT_TYPES:
+        rows = iter_ndjson(request.stream())
+    else:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Send the menu as text/csv or application/x-ndjson")
+    if await session.scalar(select(FoodPlace.id).where(FoodPlace.id == food_place_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodPlace not found")
+    report = await import_menu_items(session, food_place_id, rows)
+    await session.commit()
+    response_cache.invalidate(f"food_place:{food_place_id}:menu_items",
+                              *(f"menu_item:{menu_item_id}" for menu_item_id in report.updated_ids))
+    return report.as_dict()
+
+
+@router.post("/{food_place_id}/reservations/auto")
+@idempotent
+async def create_auto_reservation(food_place_id: int, reservation_schema: AutoCreateReservationSchema,
+                                  session: db_dep, user_id: actual_user_id_dep) -> ReservationSchema:
+    food_place = await session.get(FoodPlace, food_place_id)
+    if food_place is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodPlace not found")
+    start_datetime = reservation_schema.start_datetime
+    end_datetime = start_datetime + dt.timedelta(minutes=reservation_schema.duration_in_minutes)
+    if not in_working_time(start_datetime, end_datetime, food_place.open_time, food_place.close_time):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="This time slot is outside of working time.")
+    status_, reservation, _ = await Reservation.book_best_fit(
+        session, food_place_id, reservation_schema.seats, start_datetime, reservation_schema.duration_in_minutes,
+        user_id, candidates=settings.AUTO_BOOKING_CANDIDATES)
+    if status_ is not BookingStatus.BOOKED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="No free table for this party size at this time")
+    await publish_reservation_events(session, "reserved", [(reservation, food_place_id)])
+    await session.commit()
+    return ReservationSchema.model_validate(reservation)
+
+
+@router.get("/{food_place_id}/availability")
+async def get_food_place_availability(
+        food_place_id: int, date: dt.date,
+        duration: Annotated[int, Query(ge=MIN_DURATION_IN_MINUTES, le=MAX_DURATION_IN_MINUTES)],
+        session: read_db_dep, user_id: actual_user_id_dep,
+        seats: Annotated[int, Query(ge=1)] = 1) -> AvailabilitySchema:
     food_place = await session.get(FoodPlace, food_place_id)
     if not food_place:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodPlace not found")
-    menu_items = await session.scalars(select(MenuItem).where(MenuItem.food_place_id == food_place_id))
-    menu_items_schemas = [MenuItemSchema.model_validate(menu_item) for menu_item in menu_items]
-    return menu_items_schemas
+    open_datetime, close_datetime = working_window(date, food_place.open_time, food_place.close_time)
+    food_tables = (await session.scalars(
+        select(FoodTable).where(FoodTable.food_place_id == food_place_id, FoodTable.max_seats >= seats).order_by(
+            FoodTable.max_seats, FoodTable.table_number))).all()
+    schedules = await load_schedules(session, [food_table.id for food_table in food_tables], open_datetime,
+                                     close_datetime)
+    duration_delta = dt.timedelta(minutes=duration)
+    step = dt.timedelta(minutes=settings.AVAILABILITY_STEP_MINUTES)
+    tables_availability = [
+        TableAvailabilitySchema(
+            food_table_id=food_table.id, table_number=food_table.table_number, max_seats=food_table.max_seats,
+            start_times=schedules[food_table.id].free_starts(open_datetime, close_datetime, duration_delta, step))
+        for food_table in food_tables
+    ]
+    return AvailabilitySchema(food_place_id=food_place_id, date=date, duration_in_minutes=duration,
+                              open_datetime=open_datetime, close_datetime=close_datetime,
+                              food_tables=tables_availability)
+
+
+@router.get("/{food_place_id}/availability/stream")
+async def stream_food_place_availability(food_place_id: int, session: read_db_dep, user_id: actual_user_id_dep,
+                                         last_event_id: Annotated[str | None, Header()] = None):
+    """Server-Sent Events with the tables of the food place becoming busy ("reserved") or free ("released"),
+    to apply to the availability loaded beforehand."""
+    if await session.get(FoodPlace, food_place_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodPlace not found")
+    return StreamingResponse(availability_stream(food_place_id, last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
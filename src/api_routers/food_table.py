@@ -1,24 +1,26 @@
 from fastapi import APIRouter, HTTPException, status
 from sqlalchemy import select
 
-from src.database import db_dep
+from src.database import db_dep, read_db_dep
 from src.models import FoodTable, FoodPlace
+from src.pagination import page_dep, paginate, stream_ndjson
 from src.schemas.food_table import FoodTableSchema, CreateFoodTableSchema, UpdateFoodTableSchema
 from src.security import only_authenticated_dep
+from src.serialization import schema_columns, list_response
 
 router = APIRouter(prefix="/food_tables", tags=["FoodTables"])
 
 
 @router.get("")
-async def list_food_tables(session: db_dep):
-    request = select(FoodTable)
-    response = await session.execute(request)
-    food_tables = [FoodTableSchema.model_validate(food_table) for food_table in response.scalars().all()]
-    return food_tables
+async def list_food_tables(session: read_db_dep, page: page_dep):
+    request = paginate(select(*schema_columns(FoodTable, FoodTableSchema)), FoodTable.id, page)
+    if page.stream:
+        return stream_ndjson(request, FoodTableSchema, session)
+    return list_response(FoodTableSchema, await session.execute(request))
 
 
 @router.get("/{food_table_id}")
-async def get_food_table(food_table_id: int, session: db_dep):
+async def get_food_table(food_table_id: int, session: read_db_dep):
     food_table = await session.get(FoodTable, food_table_id)
     if food_table is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,72 @@
+from fastapi import APIRouter
+
+from src.database import engine, read_engine, pool_metrics
+from src.events import broker
+from src.hashing import password_hasher
+from src.idempotency import idempotency_store
+from src.metrics import startup_stats
+from src.outbox import outbox_worker
+from src.profiling import route_stats_snapshot
+from src.rate_limit import rate_limiter
+from src.response_cache import response_cache
+from src.security import only_admin_dep, token_cache, role_cache
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+
+@router.get("/password_hashing")
+async def password_hashing_stats(user_id: only_admin_dep):
+    return password_hasher.stats()
+
+
+@router.get("/token_cache")
+async def token_cache_stats(user_id: only_admin_dep):
+    return token_cache.stats()
+
+
+@router.get("/role_cache")
+async def role_cache_stats(user_id: only_admin_dep):
+    return role_cache.stats()
+
+
+@router.get("/response_cache")
+async def response_cache_stats(user_id: only_admin_dep):
+    return response_cache.stats()
+
+
+@router.get("/routes")
+async def route_stats(user_id: only_admin_dep):
+    return route_stats_snapshot()
+
+
+@router.get("/db_pool")
+async def db_pool_stats(user_id: only_admin_dep):
+    stats = {"primary": pool_metrics["primary"].snapshot(engine.pool)}
+    if read_engine is not engine:
+        stats["replica"] = pool_metrics["replica"].snapshot(read_engine.pool)
+    return stats
+
+
+@router.get("/events")
+async def events_stats(user_id: only_admin_dep):
+    return broker.stats()
+
+
+@router.get("/idempotency")
+async def idempotency_stats(user_id: only_admin_dep):
+    return idempotency_store.stats()
+
+
+@router.get("/rate_limit")
+async def rate_limit_stats(user_id: only_admin_dep):
+    return rate_limiter.stats()
+
+
+@router.get("/startup")
+async def startup_timing(user_id: only_admin_dep):
+    return startup_stats.stats()
+
+
+@router.get("/outbox")
+async def outbox_stats(user_id: only_admin_dep):
+    return {**outbox_worker.stats(), "backlog": await outbox_worker.backlog()}
@@ -1,30 +1,65 @@
-from fastapi import APIRouter, HTTPException, status
+import datetime as dt
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, status, Query
 from sqlalchemy import select
 
-from src.database import db_dep
-from src.models import Location
+from src.availability import available_places_stmt
+from src.config import settings
+from src.database import db_dep, read_db_dep
+from src.models import Location, FoodPlace
+from src.models.reservation import MIN_DURATION_IN_MINUTES, MAX_DURATION_IN_MINUTES
+from src.pagination import page_dep, paginate, stream_ndjson
+from src.rate_limit import rate_limit
+from src.response_cache import cached_responder_dep, response_cache
+from src.schemas.availability import AvailablePlaceSchema, AvailablePlacesSchema
 from src.schemas.location import LocationSchema, CreateLocationSchema
 from src.security import only_admin_dep, actual_user_id_dep
+from src.serialization import schema_columns, validate_rows
 
 router = APIRouter(prefix="/locations", tags=["Locations"])
 
 
 @router.get("")
-async def list_locations(session: db_dep, user_id: actual_user_id_dep):
-    request = select(Location)
-    response = await session.execute(request)
-    locations = [LocationSchema.model_validate(location) for location in response.scalars().all()]
-    return locations
+async def list_locations(session: db_dep, user_id: actual_user_id_dep, page: page_dep,
+                         cached_responder: cached_responder_dep):
+    request = paginate(select(*schema_columns(Location, LocationSchema)), Location.id, page)
+    if page.stream:
+        return stream_ndjson(request, LocationSchema, session)
+
+    async def build():
+        return validate_rows(LocationSchema, await session.execute(request))
+
+    return await cached_responder.respond(["locations"], build)
 
 
 @router.get("/{location_id}")
-async def get_location(location_id: int, session: db_dep, user_id: actual_user_id_dep):
+async def get_location(location_id: int, session: read_db_dep, user_id: actual_user_id_dep):
     location = await session.get(Location, location_id)
     if location is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     return LocationSchema.model_validate(location)
 
 
+@router.get("/{location_id}/available_places")
+@rate_limit(low_priority=True)
+async def list_available_places(
+        location_id: int, at: dt.datetime,
+        duration: Annotated[int, Query(ge=MIN_DURATION_IN_MINUTES, le=MAX_DURATION_IN_MINUTES)],
+        session: read_db_dep, user_id: actual_user_id_dep,
+        seats: Annotated[int, Query(ge=1)] = 1,
+        cursor: Annotated[str | None, Query(pattern=r"^\d+:\d+$")] = None,
+        limit: Annotated[int, Query(ge=1, le=settings.MAX_PAGE_SIZE)] = settings.DEFAULT_PAGE_SIZE
+) -> AvailablePlacesSchema:
+    if await session.scalar(select(Location.id).where(Location.id == location_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Location not found")
+    after = tuple(map(int, cursor.split(":"))) if cursor else None
+    stmt = available_places_stmt(location_id, at, at + dt.timedelta(minutes=duration), seats, after).limit(limit)
+    items = validate_rows(AvailablePlaceSchema, await session.execute(stmt))
+    next_cursor = f"{items[-1].free_tables}:{items[-1].id}" if len(items) == limit else None
+    return AvailablePlacesSchema(items=items, next_cursor=next_cursor)
+
+
 @router.post("")
 async def create_location(location_schema: CreateLocationSchema, session: db_dep,
                           user_id: only_admin_dep):
@@ -34,6 +69,7 @@ async def create_location(location_schema: CreateLocationSchema, session: db_dep
     location = Location(**location_schema.model_dump())
     session.add(location)
     await session.commit()
+    response_cache.invalidate("locations")
     await session.refresh(location)
     return LocationSchema.model_validate(location)
 
@@ -47,6 +83,7 @@ async def update_location(location_id: int, location_schema: CreateLocationSchem
     for attr, value in location_schema.model_dump().items():
         setattr(location, attr, value)
     await session.commit()
+    response_cache.invalidate("locations")
     await session.refresh(location)
     return LocationSchema.model_validate(location)
 
@@ -56,6 +93,10 @@ async def delete_location(location_id: int, session: db_dep, user_id: only_admin
     location = await session.get(Location, location_id)
     if location is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Location not found")
+    food_place_ids = (await session.scalars(select(FoodPlace.id).where(FoodPlace.location_id == location_id))).all()
     await session.delete(location)
     await session.commit()
+    response_cache.invalidate("locations", "food_places", *(f"food_place:{food_place_id}"
+                                                            for food_place_id in food_place_ids),
+                              *(f"food_place:{food_place_id}:menu_items" for food_place_id in food_place_ids))
     return {"detail": "Location deleted"}
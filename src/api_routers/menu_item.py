@@ -1,28 +1,41 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, status, Query
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 
-from src.database import db_dep
-from src.models import MenuItem, FoodPlace, BasketItem, FoodBasket
+from src.api_routers.food_basket import add_to_open_basket
+from src.database import db_dep, read_db_dep
+from src.idempotency import idempotent
+from src.pagination import page_dep, paginate, stream_ndjson
+from src.response_cache import cached_responder_dep, response_cache
+from src.models import MenuItem, FoodPlace
 from src.schemas.menu_item import CreateMenuItemSchema, MenuItemSchema
-from src.schemas.basket_item import CreateBasketItemSchema, BasketItemSchema
+from src.schemas.basket_item import BasketItemSchema
 from src.security import actual_user_id_dep, only_admin_dep
+from src.serialization import schema_columns, list_response
 
 router = APIRouter(prefix="/menu_items", tags=["MenuItem"])
 
 
 @router.get("")
-async def list_menu_items(session: db_dep, user_id: actual_user_id_dep) -> list[MenuItemSchema]:
-    menu_items = await session.scalars(select(MenuItem))
-    return [MenuItemSchema.model_validate(menu_item) for menu_item in menu_items]
+async def list_menu_items(session: read_db_dep, user_id: actual_user_id_dep, page: page_dep) -> list[MenuItemSchema]:
+    request = paginate(select(*schema_columns(MenuItem, MenuItemSchema)), MenuItem.id, page)
+    if page.stream:
+        return stream_ndjson(request, MenuItemSchema, session)
+    return list_response(MenuItemSchema, await session.execute(request))
 
 
 @router.get("/{item_id}")
-async def get_menu_item(item_id: int, session: db_dep, user_id: actual_user_id_dep) -> MenuItemSchema:
-    menu_item = await session.get(MenuItem, item_id)
-    if not menu_item:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found")
-    return MenuItemSchema.model_validate(menu_item)
+async def get_menu_item(item_id: int, session: db_dep, user_id: actual_user_id_dep,
+                        cached_responder: cached_responder_dep) -> MenuItemSchema:
+    async def build():
+        menu_item = await session.get(MenuItem, item_id)
+        if not menu_item:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found")
+        return MenuItemSchema.model_validate(menu_item)
+
+    return await cached_responder.respond(
+        lambda menu_item_schema: [f"menu_item:{item_id}", f"food_place:{menu_item_schema.food_place_id}"], build)
 
 
 @router.post("")
@@ -34,6 +47,7 @@ async def create_menu_item(menu_item_schema: CreateMenuItemSchema, session: db_d
     menu_item = MenuItem(**menu_item_schema.model_dump())
     session.add(menu_item)
     await session.commit()
+    response_cache.invalidate(f"food_place:{menu_item_schema.food_place_id}:menu_items")
     await session.refresh(menu_item)
     return MenuItemSchema.model_validate(menu_item)
 
@@ -43,29 +57,18 @@ async def delete_menu_item(item_id: int, session: db_dep, user_id: only_admin_de
     menu_item = await session.get(MenuItem, item_id)
     if not menu_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found")
-    session.delete(menu_item)
+    food_place_id = menu_item.food_place_id
+    await session.delete(menu_item)
     await session.commit()
+    response_cache.invalidate(f"menu_item:{item_id}", f"food_place:{food_place_id}:menu_items")
     return {"detail": "Menu item deleted"}
 
 
 @router.post("/{item_id}/food_baskets")
-async def add_menu_item_to_food_basket(item_id: int, session: db_dep, user_id: actual_user_id_dep) -> BasketItemSchema:
-    menu_item = await session.get(MenuItem, item_id)
-    if not menu_item:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found")
-    menu_item_schema = MenuItemSchema.model_validate(menu_item)
-    food_basket_stmt = select(FoodBasket).options(selectinload(FoodBasket.basket_items)).where(
-        FoodBasket.user_id == user_id, FoodBasket.food_place_id == menu_item_schema.food_place_id,
-        FoodBasket.is_ordered == False)
-    food_basket = await session.scalar(food_basket_stmt)
-    if not food_basket:
-        food_basket = FoodBasket(food_place_id=menu_item_schema.food_place_id, user_id=user_id)
-        session.add(food_basket)
-        await session.flush()
-    basket_item_schema = CreateBasketItemSchema(food_basket_id=food_basket.id,
-                                                menu_item_id=menu_item_schema.id)
-    basket_item = BasketItem(**basket_item_schema.model_dump())
-    session.add(basket_item)
+@idempotent
+async def add_menu_item_to_food_basket(item_id: int, session: db_dep, user_id: actual_user_id_dep,
+                                       item_quantity: Annotated[int, Query(ge=1)] = 1) -> BasketItemSchema:
+    basket_item = await add_to_open_basket(session, user_id, item_id, item_quantity)
+    basket_item_schema = BasketItemSchema.model_validate(basket_item)
     await session.commit()
-    await session.refresh(basket_item)
-    return BasketItemSchema.model_validate(basket_item)
+    return basket_item_schema
@@ -1,57 +1,98 @@
+import datetime as dt
+
 from fastapi import APIRouter, HTTPException, status
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import db_dep
+from src.availability import book_batch
+from src.database import db_dep, read_db_dep, autocommit_session
+from src.events import publish_reservation_events
+from src.idempotency import idempotent
+from src.pagination import page_dep, paginate, stream_ndjson
 from src.models import Reservation, FoodTable
-from src.schemas.reservation import ReservationSchema, CreateReservationSchema, DTCreateReservationSchema
+from src.models.reservation import BookingStatus
+from src.rate_limit import rate_limit
+from src.schemas.reservation import (ReservationSchema, CreateReservationSchema, DTCreateReservationSchema,
+                                     BatchCreateReservationSchema, BatchReservationResultSchema)
 from src.security import actual_user_id_dep, only_admin_dep
+from src.serialization import schema_columns, list_response
+from src.utils import sqlstate, EXCLUSION_VIOLATION
 
 router = APIRouter(prefix="/reservations", tags=["Reservations"])
 
+BOOKING_ERRORS = {
+    BookingStatus.TABLE_NOT_FOUND: (status.HTTP_404_NOT_FOUND, "FoodTable with this id not found"),
+    BookingStatus.TIME_OCCUPIED: (status.HTTP_400_BAD_REQUEST, "This time slot is already occupied"),
+    BookingStatus.OUTSIDE_WORKING_TIME: (status.HTTP_400_BAD_REQUEST, "This time slot is outside of working time."),
+    BookingStatus.CONFLICTS_WITH_BATCH: (status.HTTP_400_BAD_REQUEST,
+                                         "This time slot overlaps another reservation of the batch"),
+    BookingStatus.NOT_BOOKED: (status.HTTP_400_BAD_REQUEST,
+                               "Not booked because other reservations of the batch failed"),
+}
+
 
 @router.get("")
-async def list_reservations(session: db_dep, user_id: actual_user_id_dep) -> list[ReservationSchema]:
-    request = select(Reservation).where(Reservation.user_id == user_id)
-    response = await session.execute(request)
-    reservations = [ReservationSchema.model_validate(reservation) for reservation in response.scalars().all()]
-    return reservations
+async def list_reservations(session: read_db_dep, user_id: actual_user_id_dep,
+                            page: page_dep) -> list[ReservationSchema]:
+    request = paginate(select(*schema_columns(Reservation, ReservationSchema)).where(Reservation.user_id == user_id),
+                       Reservation.id, page)
+    if page.stream:
+        return stream_ndjson(request, ReservationSchema, session)
+    return list_response(ReservationSchema, await session.execute(request))
 
 
 @router.get('/all')
-async def list_all_reservations(session: db_dep, user_id: only_admin_dep) -> list[ReservationSchema]:
-    request = select(Reservation)
-    response = await session.execute(request)
-    reservations = [ReservationSchema.model_validate(reservation) for reservation in response.scalars().all()]
-    return reservations
+@rate_limit("bulk", low_priority=True)
+async def list_all_reservations(session: read_db_dep, user_id: only_admin_dep,
+                                page: page_dep) -> list[ReservationSchema]:
+    request = paginate(select(*schema_columns(Reservation, ReservationSchema)), Reservation.id, page)
+    if page.stream:
+        return stream_ndjson(request, ReservationSchema, session)
+    return list_response(ReservationSchema, await session.execute(request))
 
 
 @router.get("/{reservation_id}")
-async def get_reservation(reservation_id: int, session: db_dep, user_id: actual_user_id_dep) -> ReservationSchema:
+async def get_reservation(reservation_id: int, session: read_db_dep, user_id: actual_user_id_dep) -> ReservationSchema:
     reservation = await session.get(Reservation, reservation_id)
     if reservation is None or reservation.user_id != user_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     return ReservationSchema.model_validate(reservation)
 
 
+async def book_reservation(session: AsyncSession, reservation_schema: CreateReservationSchema,
+                           user_id: int) -> ReservationSchema:
+    try:
+        status_, reservation, food_place_id = await Reservation.book(session, **reservation_schema.model_dump(),
+                                                                    user_id=user_id)
+    except IntegrityError as error:
+        if sqlstate(error) != EXCLUSION_VIOLATION:
+            raise
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="This time slot has just been reserved by someone else")
+    if status_ in BOOKING_ERRORS:
+        status_code, detail = BOOKING_ERRORS[status_]
+        raise HTTPException(status_code=status_code, detail=detail)
+    await publish_reservation_events(session, "reserved", [(reservation, food_place_id)])
+    await session.commit()
+    return ReservationSchema.model_validate(reservation)
+
+
 @router.post("")
+@idempotent
 async def create_reservation(reservation_schema: CreateReservationSchema, session: db_dep,
                              user_id: actual_user_id_dep) -> ReservationSchema:
-    food_table = await session.get(FoodTable, reservation_schema.food_table_id)
-    if food_table is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FoodTable with this id not found")
-    reservation = Reservation(**reservation_schema.model_dump(), user_id=user_id)
-    if not await reservation.time_is_free(session):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This time slot is already occupied")
-    if not await reservation.reservation_in_working_time(session):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="This time slot is outside of working time.")
-    session.add(reservation)
-    await session.commit()
-    await session.refresh(reservation)
-    return ReservationSchema.model_validate(reservation)
+    end_datetime = reservation_schema.start_datetime + dt.timedelta(minutes=reservation_schema.duration_in_minutes)
+    if Reservation.crosses_partitions(reservation_schema.start_datetime, end_datetime):
+        return await book_reservation(session, reservation_schema, user_id)
+    # The booking is a single statement, so it does not need BEGIN/COMMIT round trips around it
+    async with autocommit_session(session) as booking_session:
+        return await book_reservation(booking_session, reservation_schema, user_id)
 
 
 @router.post("/date_and_time")
+@idempotent
 async def create_reservation_date_and_time(dt_reservation_schema: DTCreateReservationSchema,
                                            session: db_dep,
                                            user_id: actual_user_id_dep) -> ReservationSchema:
@@ -59,11 +100,47 @@ async def create_reservation_date_and_time(dt_reservation_schema: DTCreateReserv
     return await create_reservation(reservation_schema, session, user_id)
 
 
+@router.post("/batch")
+@idempotent
+async def create_reservations_batch(batch_schema: BatchCreateReservationSchema, session: db_dep,
+                                    user_id: actual_user_id_dep) -> list[BatchReservationResultSchema]:
+    reservation_schemas = [
+        CreateReservationSchema.convert_dt_schema(reservation_schema)
+        if isinstance(reservation_schema, DTCreateReservationSchema) else reservation_schema
+        for reservation_schema in batch_schema.reservations
+    ]
+    all_or_nothing = batch_schema.mode == "all_or_nothing"
+    try:
+        results = await book_batch(session, [(reservation_schema.start_datetime, reservation_schema.duration_in_minutes,
+                                              reservation_schema.food_table_id)
+                                             for reservation_schema in reservation_schemas], user_id, all_or_nothing)
+    except IntegrityError as error:
+        if sqlstate(error) != EXCLUSION_VIOLATION:
+            raise
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="A time slot of the batch has just been reserved by someone else")
+    await publish_reservation_events(session, "reserved", [(result.reservation, result.food_place_id)
+                                                           for result in results if result.reservation is not None])
+    await session.commit()
+    result_schemas = [
+        BatchReservationResultSchema(
+            index=index, status=result.status.value, detail=BOOKING_ERRORS.get(result.status, (None, None))[1],
+            reservation=ReservationSchema.model_validate(result.reservation) if result.reservation else None)
+        for index, result in enumerate(results)
+    ]
+    if all_or_nothing and any(result.status is not BookingStatus.BOOKED for result in results):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=jsonable_encoder(result_schemas))
+    return result_schemas
+
+
 @router.delete("/{reservation_id}")
 async def delete_reservation(reservation_id: int, session: db_dep, user_id: actual_user_id_dep):
-    reservation = await session.get(Reservation, reservation_id)
-    if reservation is None or reservation.user_id != user_id:
+    row = (await session.execute(select(Reservation, FoodTable.food_place_id).join(Reservation.food_table).where(
+        Reservation.id == reservation_id))).one_or_none()
+    if row is None or row.Reservation.user_id != user_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found")
+    reservation = row.Reservation
+    await publish_reservation_events(session, "released", [(reservation, row.food_place_id)])
     await session.delete(reservation)
     await session.commit()
     return {"detail": "Reservation deleted"}
@@ -0,0 +1,60 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database import read_db_dep
+from src.models import FoodPlace, MenuItem
+from src.rate_limit import rate_limit
+from src.schemas.food_place import FoodPlaceSchema
+from src.schemas.menu_item import MenuItemSchema
+from src.schemas.search import (FoodPlaceSearchSchema, FoodPlaceSearchResultSchema, MenuItemSearchSchema,
+                                MenuItemSearchResultSchema)
+from src.search import search, QueryTooBroadError, MIN_PREFIX_LENGTH
+from src.security import actual_user_id_dep
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+query_param = Annotated[str, Query(min_length=2, max_length=settings.SEARCH_MAX_QUERY_LENGTH)]
+cursor_param = Annotated[str | None, Query(pattern=r"^[wf]:\d+(\.\d+)?:\d+$")]
+limit_param = Annotated[int, Query(ge=1, le=settings.SEARCH_MAX_LIMIT)]
+
+
+async def run_search(session: AsyncSession, model: type[FoodPlace] | type[MenuItem], q: str, cursor: str | None,
+                     limit: int, filters: list) -> tuple[list[tuple], str | None, bool]:
+    try:
+        return await search(session, model, q, cursor, limit, *filters)
+    except QueryTooBroadError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"Search query is too broad, type a word of at least {MIN_PREFIX_LENGTH} characters")
+
+
+@router.get("/food_places")
+@rate_limit(low_priority=True)
+async def search_food_places(q: query_param, session: read_db_dep, user_id: actual_user_id_dep,
+                             location_id: int | None = None, cursor: cursor_param = None,
+                             limit: limit_param = settings.SEARCH_DEFAULT_LIMIT) -> FoodPlaceSearchSchema:
+    filters = [FoodPlace.location_id == location_id] if location_id is not None else []
+    rows, next_cursor, truncated = await run_search(session, FoodPlace, q, cursor, limit, filters)
+    items = [FoodPlaceSearchResultSchema(**FoodPlaceSchema.model_validate(food_place).model_dump(), rank=rank)
+             for food_place, rank in rows]
+    return FoodPlaceSearchSchema(items=items, next_cursor=next_cursor, truncated=truncated)
+
+
+@router.get("/menu_items")
+@rate_limit(low_priority=True)
+async def search_menu_items(q: query_param, session: read_db_dep, user_id: actual_user_id_dep,
+                            location_id: int | None = None, food_place_id: int | None = None,
+                            cursor: cursor_param = None,
+                            limit: limit_param = settings.SEARCH_DEFAULT_LIMIT) -> MenuItemSearchSchema:
+    filters = []
+    if location_id is not None:
+        filters.append(MenuItem.food_place_id.in_(select(FoodPlace.id).where(FoodPlace.location_id == location_id)))
+    if food_place_id is not None:
+        filters.append(MenuItem.food_place_id == food_place_id)
+    rows, next_cursor, truncated = await run_search(session, MenuItem, q, cursor, limit, filters)
+    items = [MenuItemSearchResultSchema(**MenuItemSchema.model_validate(menu_item).model_dump(), rank=rank)
+             for menu_item, rank in rows]
+    return MenuItemSearchSchema(items=items, next_cursor=next_cursor, truncated=truncated)
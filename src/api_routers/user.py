@@ -1,22 +1,40 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, status
 from sqlalchemy import select
 
-from src.database import db_dep
+from src.database import db_dep, read_db_dep
+from src.pagination import page_dep, paginate, stream_ndjson
 from src.models import User
-from src.schemas.user import UserSchema, AdminSchema
-from src.security import actual_user_id_dep, only_admin_dep
+from src.schemas.user import UserSchema, AdminSchema, UpdateUserRolesSchema
+from src.security import actual_user_id_dep, only_admin_dep, role_cache
+from src.serialization import schema_columns, list_response
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @router.get("")
-async def list_users(session: db_dep, user_id: only_admin_dep):
-    request = select(User)
-    users = (await session.execute(request)).scalars()
-    return [AdminSchema.model_validate(user) for user in users]
+async def list_users(session: read_db_dep, user_id: only_admin_dep, page: page_dep):
+    request = paginate(select(*schema_columns(User, AdminSchema)), User.id, page)
+    if page.stream:
+        return stream_ndjson(request, AdminSchema, session)
+    return list_response(AdminSchema, await session.execute(request))
 
 
 @router.get("/me")
-async def actual_user(session: db_dep, user_id: actual_user_id_dep):
+async def actual_user(session: read_db_dep, user_id: actual_user_id_dep):
     user = await session.get(User, user_id)
     return UserSchema.model_validate(user)
+
+
+@router.patch("/{target_user_id}")
+async def update_user_roles(target_user_id: int, roles_schema: UpdateUserRolesSchema, session: db_dep,
+                            user_id: only_admin_dep) -> AdminSchema:
+    user = await session.get(User, target_user_id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    for attr, value in roles_schema.model_dump(exclude_none=True).items():
+        setattr(user, attr, value)
+    user.bump_token_version()
+    await session.commit()
+    await session.refresh(user)
+    role_cache.invalidate(str(target_user_id))
+    return AdminSchema.model_validate(user)
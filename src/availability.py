@@ -0,0 +1,167 @@
+import bisect
+import datetime as dt
+
+from sqlalchemy import select, func, exists, and_, or_, Select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import Reservation, FoodTable, FoodPlace
+from src.models.reservation import MAX_DURATION_IN_MINUTES, BookingStatus, BookingResult
+from src.utils import in_working_time
+
+
+class TableSchedule:
+    """Busy intervals of one table, kept sorted and merged so both bounds are bisectable."""
+
+    def __init__(self):
+        self.starts: list[dt.datetime] = []
+        self.ends: list[dt.datetime] = []
+
+    def add(self, start: dt.datetime, end: dt.datetime):
+        left = bisect.bisect_left(self.ends, start)
+        right = bisect.bisect_right(self.starts, end)
+        if left < right:
+            start = min(start, self.starts[left])
+            end = max(end, self.ends[right - 1])
+            del self.starts[left:right]
+            del self.ends[left:right]
+        self.starts.insert(left, start)
+        self.ends.insert(left, end)
+
+    def is_free(self, start: dt.datetime, end: dt.datetime) -> bool:
+        index = bisect.bisect_right(self.ends, start)
+        return index == len(self.starts) or self.starts[index] >= end
+
+    def free_starts(self, window_start: dt.datetime, window_end: dt.datetime, duration: dt.timedelta,
+                    step: dt.timedelta) -> list[dt.datetime]:
+        free_starts = []
+        index = bisect.bisect_right(self.ends, window_start)
+        start = window_start
+        while start + duration <= window_end:
+            while index < len(self.ends) and self.ends[index] <= start:
+                index += 1
+            if index < len(self.starts) and self.starts[index] < start + duration:
+                # Jump straight to the first slot of the grid after the busy interval
+                start += -(-(self.ends[index] - start) // step) * step
+                continue
+            free_starts.append(start)
+            start += step
+        return free_starts
+
+
+async def load_schedules(session: AsyncSession, food_table_ids: list[int], window_start: dt.datetime,
+                         window_end: dt.datetime) -> dict[int, TableSchedule]:
+    schedules = {food_table_id: TableSchedule() for food_table_id in food_table_ids}
+    if not food_table_ids:
+        return schedules
+    stmt = select(Reservation.food_table_id, Reservation.start_datetime, Reservation.duration_in_minutes).where(
+        Reservation.food_table_id.in_(food_table_ids),
+        Reservation.start_datetime < window_end,
+        Reservation.start_datetime > window_start - dt.timedelta(minutes=MAX_DURATION_IN_MINUTES)
+    )
+    for food_table_id, start_datetime, duration_in_minutes in await session.execute(stmt):
+        schedules[food_table_id].add(start_datetime, start_datetime + dt.timedelta(minutes=duration_in_minutes))
+    return schedules
+
+
+async def load_interval_schedules(session: AsyncSession,
+                                  intervals: list[tuple[int, dt.datetime, dt.datetime]]) -> dict[int, TableSchedule]:
+    """Schedules of the tables of (food_table_id, start, end) intervals holding only the reservations overlapping one
+    of them, so intervals months apart neither load the reservations in between nor scan the partitions between."""
+    schedules = {food_table_id: TableSchedule() for food_table_id, _, _ in intervals}
+    if not intervals:
+        return schedules
+    stmt = select(Reservation.food_table_id, Reservation.start_datetime, Reservation.duration_in_minutes).where(or_(
+        *(and_(Reservation.food_table_id == food_table_id, Reservation.overlapping(start_datetime, end_datetime))
+          for food_table_id, start_datetime, end_datetime in set(intervals))
+    ))
+    for food_table_id, start_datetime, duration_in_minutes in await session.execute(stmt):
+        schedules[food_table_id].add(start_datetime, start_datetime + dt.timedelta(minutes=duration_in_minutes))
+    return schedules
+
+
+def available_places_stmt(location_id: int, start_datetime: dt.datetime, end_datetime: dt.datetime, seats: int,
+                          after: tuple[int, int] | None = None) -> Select:
+    """Food places of the location open for the whole interval, with their count of free tables seating the party,
+    most free tables first. ``after`` is the (free_tables, id) of the previous page's last place."""
+    free_tables = func.count(FoodTable.id)
+    stmt = select(FoodPlace.id, FoodPlace.name, FoodPlace.address, FoodPlace.description, FoodPlace.open_time,
+                  FoodPlace.close_time, FoodPlace.location_id, free_tables.label("free_tables")).join(
+        FoodTable, and_(FoodTable.food_place_id == FoodPlace.id, FoodTable.max_seats >= seats)
+    ).where(
+        FoodPlace.location_id == location_id,
+        FoodPlace.open_during(start_datetime, end_datetime),
+        ~exists().where(Reservation.food_table_id == FoodTable.id,
+                        Reservation.overlapping(start_datetime, end_datetime))
+    ).group_by(FoodPlace.id).order_by(free_tables.desc(), FoodPlace.id)
+    if after is not None:
+        after_free_tables, after_id = after
+        stmt = stmt.having(or_(free_tables < after_free_tables,
+                               and_(free_tables == after_free_tables, FoodPlace.id > after_id)))
+    return stmt
+
+
+async def book_batch(session: AsyncSession, reservations: list[tuple[dt.datetime, int, int]], user_id: int,
+                     all_or_nothing: bool) -> list[BookingResult]:
+    """Book (start_datetime, duration_in_minutes, food_table_id) items checking them against the existing
+    reservations and each other with one query per table set; the caller commits."""
+    food_table_ids = list({food_table_id for _, _, food_table_id in reservations})
+    tables = {food_table_id: (food_place_id, open_time, close_time)
+              for food_table_id, food_place_id, open_time, close_time in await session.execute(
+                  select(FoodTable.id, FoodTable.food_place_id, FoodPlace.open_time, FoodPlace.close_time).join(
+                      FoodTable.food_place).where(FoodTable.id.in_(food_table_ids)))}
+    await Reservation.lock_partition_boundaries(session, {
+        food_table_id for start_datetime, duration, food_table_id in reservations if food_table_id in tables
+        and Reservation.crosses_partitions(start_datetime, start_datetime + dt.timedelta(minutes=duration))
+    })
+    schedules = await load_interval_schedules(session, [
+        (food_table_id, start_datetime, start_datetime + dt.timedelta(minutes=duration))
+        for start_datetime, duration, food_table_id in reservations if food_table_id in tables
+    ])
+    batch_schedules = {food_table_id: TableSchedule() for food_table_id in tables}
+
+    statuses = []
+    for start_datetime, duration_in_minutes, food_table_id in reservations:
+        end_datetime = start_datetime + dt.timedelta(minutes=duration_in_minutes)
+        if food_table_id not in tables:
+            statuses.append(BookingStatus.TABLE_NOT_FOUND)
+            continue
+        if not schedules[food_table_id].is_free(start_datetime, end_datetime):
+            statuses.append(BookingStatus.TIME_OCCUPIED)
+        elif not in_working_time(start_datetime, end_datetime, *tables[food_table_id][1:]):
+            statuses.append(BookingStatus.OUTSIDE_WORKING_TIME)
+        elif not batch_schedules[food_table_id].is_free(start_datetime, end_datetime):
+            statuses.append(BookingStatus.CONFLICTS_WITH_BATCH)
+        else:
+            batch_schedules[food_table_id].add(start_datetime, end_datetime)
+            statuses.append(BookingStatus.BOOKED)
+
+    booked = [reservation for reservation, status in zip(reservations, statuses) if status is BookingStatus.BOOKED]
+    if all_or_nothing and len(booked) < len(reservations):
+        return [BookingResult(BookingStatus.NOT_BOOKED if status is BookingStatus.BOOKED else status)
+                for status in statuses]
+    ids = {}
+    if booked:
+        stmt = insert(Reservation).values([
+            {"start_datetime": start_datetime, "duration_in_minutes": duration_in_minutes,
+             "food_table_id": food_table_id, "user_id": user_id}
+            for start_datetime, duration_in_minutes, food_table_id in booked
+        ]).returning(Reservation.id, Reservation.food_table_id, Reservation.start_datetime)
+        if not all_or_nothing:
+            # Rows lost to a concurrent booking are skipped by the exclusion constraint instead of failing the batch
+            stmt = stmt.on_conflict_do_nothing()
+        ids = {(food_table_id, start_datetime): id_
+               for id_, food_table_id, start_datetime in await session.execute(stmt)}
+
+    results = []
+    for (start_datetime, duration_in_minutes, food_table_id), status in zip(reservations, statuses):
+        if status is not BookingStatus.BOOKED:
+            results.append(BookingResult(status))
+        elif (food_table_id, start_datetime) not in ids:
+            results.append(BookingResult(BookingStatus.TIME_OCCUPIED))
+        else:
+            reservation = Reservation(id=ids[food_table_id, start_datetime], start_datetime=start_datetime,
+                                      duration_in_minutes=duration_in_minutes, food_table_id=food_table_id,
+                                      user_id=user_id)
+            results.append(BookingResult(status, reservation, tables[food_table_id][0]))
+    return results
@@ -1,19 +1,121 @@
-from typing import Annotated
+import time
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncIterator
 
-from fastapi import Depends
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import DeclarativeBase
+import jwt
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.config import settings
+from src.metrics import PoolMetrics
+from src.ttl_cache import TTLCache
 
-engine = create_async_engine(settings.db_url)
+pool_metrics: dict[str, PoolMetrics] = {}
 
-session_factory = async_sessionmaker(engine)
 
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Records how long each checkout waits; the pool's logging name selects its PoolMetrics."""
 
-async def get_db():
+    def _do_get(self):
+        metrics = pool_metrics[self._orig_logging_name]
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.checkout_wait.observe(time.perf_counter() - started)
+
+
+def create_engine(url: str, name: str, pool_size: int = settings.DB_POOL_SIZE,
+                  max_overflow: int = settings.DB_MAX_OVERFLOW) -> AsyncEngine:
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+        connect_args["server_settings"] = {
+            # The <% operator of the fuzzy search only matches above this threshold, and the trigram index honors it
+            "pg_trgm.word_similarity_threshold": str(settings.SEARCH_FUZZY_THRESHOLD),
+            # Sequential scans start at the first block, so the search finds the same first matches every time
+            "synchronize_seqscans": "off",
+        }
+    metrics = pool_metrics[name] = PoolMetrics()
+    async_engine = create_async_engine(
+        url, poolclass=MeteredQueuePool, pool_logging_name=name, pool_size=pool_size,
+        max_overflow=max_overflow, pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING, pool_recycle=settings.DB_POOL_RECYCLE, connect_args=connect_args)
+    event.listen(async_engine.sync_engine, "connect", metrics.on_connect)
+    event.listen(async_engine.sync_engine, "checkout", metrics.on_checkout)
+    event.listen(async_engine.sync_engine, "checkin", metrics.on_checkin)
+    event.listen(async_engine.sync_engine, "invalidate", metrics.on_invalidate)
+    return async_engine
+
+
+class PrimarySession(Session):
+    pass
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def remember_commit(session: Session):
+    session.info["committed"] = True
+
+
+engine = create_engine(settings.db_url, "primary")
+read_engine = create_engine(settings.DB_READ_URL, "replica") if settings.DB_READ_URL else engine
+
+session_factory = async_sessionmaker(engine, sync_session_class=PrimarySession)
+# Shares the primary's pool; its connections run each statement on its own, without BEGIN/COMMIT round trips
+autocommit_session_factory = async_sessionmaker(engine.execution_options(isolation_level="AUTOCOMMIT"),
+                                                sync_session_class=PrimarySession)
+read_session_factory = async_sessionmaker(read_engine) if read_engine is not engine else session_factory
+
+recent_writers = TTLCache(settings.READ_AFTER_WRITE_MAX_USERS, settings.READ_AFTER_WRITE_SECONDS)
+
+
+def request_user_key(request: Request) -> str | None:
+    # Only used to pick an engine, the route's own auth dependency still verifies the token
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return str(jwt.decode(token, options={"verify_signature": False})["sub"])
+    except (jwt.PyJWTError, KeyError):
+        return None
+
+
+async def get_db(request: Request):
     async with session_factory() as session:
         yield session
+        if session.info.get("committed") and read_engine is not engine:
+            user_key = request_user_key(request)
+            if user_key is not None:
+                recent_writers.put(user_key, True)
+
+
+@asynccontextmanager
+async def autocommit_session(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """A session on an autocommit connection of its own, whatever the request's session has already done;
+    its commits count as the request's for read-after-write routing."""
+    async with autocommit_session_factory() as autocommit:
+        try:
+            yield autocommit
+        finally:
+            if autocommit.info.get("committed"):
+                session.info["committed"] = True
+
+
+async def get_read_db(request: Request):
+    factory = read_session_factory
+    if factory is not session_factory:
+        user_key = request_user_key(request)
+        if user_key is not None and recent_writers.get(user_key):
+            factory = session_factory
+    async with factory() as session:
+        yield session
 
 
 class Base(DeclarativeBase):
@@ -22,3 +124,4 @@ class Base(DeclarativeBase):
 
 
 db_dep = Annotated[AsyncSession, Depends(get_db)]
+read_db_dep = Annotated[AsyncSession, Depends(get_read_db)]
@@ -0,0 +1,231 @@
+import abc
+import asyncio
+import collections
+import logging
+import secrets
+from typing import AsyncIterator, Literal
+
+import asyncpg
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.database import PrimarySession
+from src.models import Reservation
+from src.schemas.availability import AvailabilityEventSchema
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "availability"
+PENDING_EVENTS = "availability_events"
+RECONNECT_DELAY_SECONDS = 1
+
+
+class Subscription:
+    """Bounded buffer of one stream. A stream that falls behind is closed instead of buffering without limit;
+    the client reconnects and resumes from its last event id."""
+
+    def __init__(self, food_place_id: int, maxsize: int):
+        self.food_place_id = food_place_id
+        self.queue: asyncio.Queue[AvailabilityEventSchema | None] = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def push(self, availability_event: AvailabilityEventSchema) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(availability_event)
+        except asyncio.QueueFull:
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Broker(abc.ABC):
+    """Fans availability events out to the streams of their food place and keeps the last events of each place
+    so that a reconnecting stream can resume."""
+
+    def __init__(self):
+        self.subscriptions: dict[int, set[Subscription]] = collections.defaultdict(set)
+        self.history: dict[int, collections.deque[AvailabilityEventSchema]] = collections.defaultdict(
+            lambda: collections.deque(maxlen=settings.EVENTS_REPLAY_SIZE))
+        self.dispatched = 0
+        self.delivered = 0
+        self.dropped_streams = 0
+
+    def dispatch(self, availability_event: AvailabilityEventSchema):
+        self.dispatched += 1
+        self.history[availability_event.food_place_id].append(availability_event)
+        for subscription in list(self.subscriptions.get(availability_event.food_place_id, ())):
+            if subscription.push(availability_event):
+                self.delivered += 1
+            else:
+                self.dropped_streams += 1
+                self.unsubscribe(subscription)
+
+    def subscribe(self, food_place_id: int,
+                  last_event_id: str | None) -> tuple[Subscription, list[AvailabilityEventSchema] | None]:
+        """Returns the subscription and the events after ``last_event_id``, or None if that event is no longer
+        known and the client has to reload the availability."""
+        replay = []
+        if last_event_id is not None:
+            history = list(self.history.get(food_place_id, ()))
+            ids = [availability_event.id for availability_event in history]
+            replay = history[ids.index(last_event_id) + 1:] if last_event_id in ids else None
+        subscription = Subscription(food_place_id, settings.EVENTS_SUBSCRIBER_BUFFER)
+        self.subscriptions[food_place_id].add(subscription)
+        return subscription, replay
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self.subscriptions.get(subscription.food_place_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.food_place_id]
+
+    def reset(self):
+        """Forget the history and close all streams, after events may have been missed."""
+        self.history.clear()
+        for subscriptions in list(self.subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.close()
+                self.unsubscribe(subscription)
+
+    @abc.abstractmethod
+    async def publish(self, session: AsyncSession, events: list[AvailabilityEventSchema]):
+        ...
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.EVENTS_BACKEND,
+            "streams": sum(len(subscriptions) for subscriptions in self.subscriptions.values()),
+            "food_places": len(self.subscriptions),
+            "dispatched": self.dispatched,
+            "delivered": self.delivered,
+            "dropped_streams": self.dropped_streams,
+        }
+
+
+class LocalBroker(Broker):
+    """Delivers the events of a session within this process once the session commits."""
+
+    async def publish(self, session: AsyncSession, events: list[AvailabilityEventSchema]):
+        session.info.setdefault(PENDING_EVENTS, []).extend(events)
+
+
+class PostgresBroker(Broker):
+    """Sends the events with NOTIFY in the writing transaction, so every worker listening to the channel receives
+    them on commit, in commit order."""
+
+    def __init__(self):
+        super().__init__()
+        self.listener: asyncio.Task | None = None
+
+    async def publish(self, session: AsyncSession, events: list[AvailabilityEventSchema]):
+        await session.execute(text("SELECT pg_notify(:channel, :payload)"),
+                              [{"channel": CHANNEL, "payload": availability_event.model_dump_json()}
+                               for availability_event in events])
+
+    async def start(self):
+        self.listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+
+    def on_notification(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str):
+        self.dispatch(AvailabilityEventSchema.model_validate_json(payload))
+
+    async def listen(self):
+        while True:
+            try:
+                connection = await asyncpg.connect(host=settings.DB_HOST, port=settings.DB_PORT,
+                                                   user=settings.DB_USER, password=settings.DB_PASS,
+                                                   database=settings.DB_NAME)
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("Cannot connect to listen for availability events")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+                continue
+            terminated = asyncio.Event()
+            connection.add_termination_listener(lambda _: terminated.set())
+            try:
+                await connection.add_listener(CHANNEL, self.on_notification)
+                await terminated.wait()
+                logger.warning("Availability events connection lost, reconnecting")
+            finally:
+                # Whatever was notified while not listening is lost
+                self.reset()
+                await connection.close()
+
+
+broker = PostgresBroker() if settings.EVENTS_BACKEND == "postgres" else LocalBroker()
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def dispatch_committed_events(session: Session):
+    for availability_event in session.info.pop(PENDING_EVENTS, ()):
+        broker.dispatch(availability_event)
+
+
+@event.listens_for(PrimarySession, "after_rollback")
+def discard_rolled_back_events(session: Session):
+    session.info.pop(PENDING_EVENTS, None)
+
+
+async def publish_reservation_events(session: AsyncSession, event_type: Literal["reserved", "released"],
+                                     reservations: list[tuple[Reservation, int]]):
+    """Publish that the reservations' tables became busy or free, effective when the session commits.
+
+    The reservations come with the food place id of their table, which the booking queries return anyway.
+    """
+    if not reservations:
+        return
+    await broker.publish(session, [
+        AvailabilityEventSchema(id=secrets.token_hex(8), type=event_type, food_place_id=food_place_id,
+                                food_table_id=reservation.food_table_id, reservation_id=reservation.id,
+                                start_datetime=reservation.start_datetime, end_datetime=reservation.end_datetime)
+        for reservation, food_place_id in reservations
+    ])
+
+
+def format_event(availability_event: AvailabilityEventSchema) -> str:
+    return (f"id: {availability_event.id}\nevent: {availability_event.type}\n"
+            f"data: {availability_event.model_dump_json()}\n\n")
+
+
+async def availability_stream(food_place_id: int, last_event_id: str | None) -> AsyncIterator[str]:
+    """Server-Sent Events of a food place. A "reset" event tells a resuming client that events were missed and
+    the availability has to be reloaded; comment lines keep idle connections alive."""
+    subscription, replay = broker.subscribe(food_place_id, last_event_id)
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MILLISECONDS}\n\n"
+        if replay is None:
+            yield "event: reset\ndata: {}\n\n"
+        for availability_event in replay or ():
+            yield format_event(availability_event)
+        while True:
+            try:
+                availability_event = await asyncio.wait_for(subscription.queue.get(),
+                                                            settings.EVENTS_HEARTBEAT_SECONDS)
+            except TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if availability_event is None:
+                break
+            yield format_event(availability_event)
+    finally:
+        broker.unsubscribe(subscription)
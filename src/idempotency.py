@@ -0,0 +1,248 @@
+import asyncio
+import datetime as dt
+import hashlib
+import logging
+import time
+
+from fastapi import status
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import Row, select, update, delete, or_, and_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config import settings
+from src.database import create_engine
+from src.models import IdempotencyKey
+from src.security import scope_user_id
+from src.utils import route_endpoint
+
+logger = logging.getLogger(__name__)
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# Duplicates served by another worker cannot be woken up, they poll the key at this interval
+POLL_INTERVAL_SECONDS = 0.05
+
+
+def idempotent(endpoint):
+    """Mark a write route whose requests may carry an Idempotency-Key header."""
+    endpoint.idempotent = True
+    return endpoint
+
+
+class IdempotencyStore:
+    """Keys are claimed, completed and released on a small autocommit pool of its own, so that an idempotent POST
+    takes no connection from the primary pool besides the route's, and needs no BEGIN/COMMIT round trips.
+    IDEMPOTENCY_POOL_SIZE bounds how many requests claim or store a key at the same time."""
+
+    def __init__(self):
+        self.engine = None
+        self.in_flight: dict[tuple[int, str], asyncio.Event] = {}
+        self.stored = 0
+        self.replayed = 0
+        self.waited = 0
+        self.mismatched = 0
+        self.purged = 0
+
+    async def claim(self, user_id: int, key: str, request_hash: bytes) -> tuple[bool, Row | None]:
+        """Take the key for this request, or return the row of the request holding it (None if it just went
+        away). An expired key, or one whose request has not finished within IDEMPOTENCY_LOCK_SECONDS, is taken
+        over."""
+        now = dt.datetime.now()
+        stale = now - dt.timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        stmt = insert(IdempotencyKey).values(
+            user_id=user_id, key=key, request_hash=request_hash, locked_at=now,
+            expires_at=now + dt.timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+            set_={"request_hash": stmt.excluded.request_hash, "locked_at": stmt.excluded.locked_at,
+                  "expires_at": stmt.excluded.expires_at, "status_code": None, "content_type": None, "body": None},
+            where=or_(IdempotencyKey.expires_at <= now,
+                      and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_at <= stale))
+        ).returning(IdempotencyKey.user_id)
+        async with self.engine.connect() as connection:
+            if await connection.scalar(stmt) is not None:
+                return True, None
+            row = (await connection.execute(
+                select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.content_type,
+                       IdempotencyKey.body).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            )).one_or_none()
+        return False, row
+
+    async def complete(self, user_id: int, key: str, status_code: int, content_type: str | None, body: bytes):
+        async with self.engine.connect() as connection:
+            await connection.execute(update(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+            ).values(status_code=status_code, content_type=content_type, body=body))
+        self.stored += 1
+
+    async def release(self, user_id: int, key: str):
+        """Drop the key of a request that failed, so that a retry runs it again."""
+        async with self.engine.connect() as connection:
+            await connection.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id, IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None)))
+
+    async def wait(self, user_id: int, key: str, timeout: float):
+        event = self.in_flight.get((user_id, key))
+        if event is None:
+            await asyncio.sleep(min(POLL_INTERVAL_SECONDS, timeout))
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except TimeoutError:
+            pass
+
+    async def purge(self) -> int:
+        """Delete the expired keys in batches, each in its own short transaction."""
+        purged = 0
+        while True:
+            expired = select(IdempotencyKey.user_id, IdempotencyKey.key).where(
+                IdempotencyKey.expires_at <= dt.datetime.now()
+            ).limit(settings.IDEMPOTENCY_PURGE_BATCH_SIZE).with_for_update(skip_locked=True)
+            async with self.engine.connect() as connection:
+                deleted = (await connection.execute(delete(IdempotencyKey).where(
+                    tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(expired)))).rowcount
+            purged += deleted
+            self.purged += deleted
+            if deleted < settings.IDEMPOTENCY_PURGE_BATCH_SIZE:
+                return purged
+            await asyncio.sleep(0)
+
+    async def start(self):
+        self.engine = create_engine(settings.db_url, "idempotency", pool_size=settings.IDEMPOTENCY_POOL_SIZE,
+                                    max_overflow=0).execution_options(isolation_level="AUTOCOMMIT")
+
+    async def stop(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.in_flight),
+            "stored": self.stored,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "mismatched": self.mismatched,
+            "purged": self.purged,
+        }
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def purge_loop(interval: float):
+    while True:
+        try:
+            purged = await idempotency_store.purge()
+        except Exception:
+            logger.exception("Purging idempotency keys failed")
+        else:
+            if purged:
+                logger.info("Purged %d expired idempotency keys", purged)
+        await asyncio.sleep(interval)
+
+
+class IdempotencyMiddleware:
+    """Runs a POST to an ``@idempotent`` route once per user and Idempotency-Key.
+
+    The first response is stored for IDEMPOTENCY_TTL_SECONDS and replayed to retries with an
+    ``Idempotent-Replayed: true`` header; a retry arriving while the first request runs waits for its response.
+    Reusing a key for a different request is rejected, and server errors are not stored, so they can be retried.
+    Requests that are not authenticated go through untouched and fail in the route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        key = dict(scope["headers"]).get(HEADER)
+        user_id = scope_user_id(scope) if key is not None else None
+        if user_id is None or not getattr(route_endpoint(scope), "idempotent", False):
+            await self.app(scope, receive, send)
+            return
+        key = key.decode("latin-1")
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            await JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                               content={"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"})(
+                scope, receive, send)
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (scope["method"], scope["path"], scope["query_string"].decode("latin-1")):
+            digest.update(part.encode() + b"\0")
+        digest.update(body)
+        request_hash = digest.digest()
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            claimed, row = await idempotency_store.claim(user_id, key, request_hash)
+            if claimed:
+                await self.run(scope, receive, send, body, user_id, key)
+                return
+            if row is not None:
+                if row.request_hash != request_hash:
+                    idempotency_store.mismatched += 1
+                    await JSONResponse(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        content={"detail": "Idempotency-Key was already used for a different request"})(
+                        scope, receive, send)
+                    return
+                if row.status_code is not None:
+                    idempotency_store.replayed += 1
+                    await Response(content=row.body, status_code=row.status_code, media_type=row.content_type,
+                                   headers={"Idempotent-Replayed": "true"})(scope, receive, send)
+                    return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                await JSONResponse(status_code=status.HTTP_409_CONFLICT, headers={"Retry-After": "1"},
+                                   content={"detail": "A request with this Idempotency-Key is still in progress"})(
+                    scope, receive, send)
+                return
+            idempotency_store.waited += 1
+            await idempotency_store.wait(user_id, key, remaining)
+
+    async def run(self, scope, receive, send, body: bytes, user_id: int, key: str):
+        body_sent = False
+        status_code = None
+        content_type = None
+        response_body = []
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_and_capture(message):
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"").decode("latin-1") or None
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        finished = idempotency_store.in_flight[user_id, key] = asyncio.Event()
+        try:
+            await self.app(scope, receive_body, send_and_capture)
+        except BaseException:
+            await asyncio.shield(idempotency_store.release(user_id, key))
+            raise
+        else:
+            if status_code is None or status_code >= 500:
+                await idempotency_store.release(user_id, key)
+            else:
+                await idempotency_store.complete(user_id, key, status_code, content_type, b"".join(response_body))
+        finally:
+            idempotency_store.in_flight.pop((user_id, key), None)
+            finished.set()
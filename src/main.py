@@ -1,11 +1,61 @@
-import uvicorn
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 from src.api_routers import api_router
+from src.config import settings
+from src.database import engine, read_engine
+from src.events import broker
+from src.idempotency import IdempotencyMiddleware, idempotency_store, purge_loop
+from src.outbox import outbox_worker
+from src.partitions import maintenance_loop
+from src.profiling import ProfilingMiddleware
+from src.rate_limit import RateLimitMiddleware, rate_limiter
+from src.server import serve
+from src.warmup import warm_up, mark_ready
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up()
+    await idempotency_store.start()
+    tasks = []
+    if settings.RESERVATION_MAINTENANCE_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(maintenance_loop(engine, settings.RESERVATION_MAINTENANCE_INTERVAL_SECONDS)))
+    if settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(purge_loop(settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS)))
+    if settings.OUTBOX_POLL_SECONDS > 0:
+        tasks.append(asyncio.create_task(outbox_worker.run(settings.OUTBOX_POLL_SECONDS)))
+    await broker.start()
+    await rate_limiter.start()
+    mark_ready()
+    yield
+    await rate_limiter.stop()
+    await broker.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await idempotency_store.stop()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.include_router(api_router)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"},
+                        content={"detail": "Database is busy, try again later"})
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000)
+    serve()
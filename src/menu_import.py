@@ -0,0 +1,160 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy import Table, MetaData, Column, Integer, Text, Numeric, select, literal, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateTable
+
+from src.config import settings
+from src.models import MenuItem
+from src.schemas.menu_item import CreateMenuItemSchema
+
+CSV_CONTENT_TYPES = ("text/csv",)
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+IMPORT_COLUMNS = ["row_number", "name", "description", "price"]
+
+# Session-local staging table, created per import and dropped on commit
+staging_table = Table(
+    "menu_items_import", MetaData(),
+    Column("row_number", Integer, nullable=False),
+    Column("name", Text, nullable=False),
+    Column("description", Text),
+    Column("price", Numeric(10, 2), nullable=False),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.errors: list[dict] = []
+        self.updated_ids: list[int] = []
+
+    def reject(self, row_number: int, errors: list[dict]):
+        self.rejected += 1
+        if len(self.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in chunks:
+        *lines, tail = (tail + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield row_number, None, f"Invalid JSON: {error.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Row must be a JSON object"
+            continue
+        yield row_number, row, None
+
+
+async def iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Rows of a CSV with a header line; a quoted field may span lines, so a record ends at an even quote count."""
+    header = None
+    row_number = 0
+    record = ""
+    async for line in iter_lines(chunks):
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record.rstrip("\r")]), []), ""
+        if not values:
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, f"Expected {len(header)} fields, got {len(values)}"
+            continue
+        yield row_number, {key: value if value != "" else None for key, value in zip(header, values)}, None
+    if record:
+        yield row_number + 1, None, "Unterminated quoted field"
+
+
+async def copy_chunk(session: AsyncSession, records: list[tuple]):
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(staging_table.name, records=records,
+                                                                 columns=IMPORT_COLUMNS)
+
+
+async def import_menu_items(session: AsyncSession, food_place_id: int,
+                            rows: AsyncIterator[tuple[int, dict | None, str | None]]) -> ImportReport:
+    """Validates rows in chunks, COPYs them into a staging table and merges it into menu_items.
+
+    Rows with the same name are merged by the last one; existing items of the food place are updated.
+    """
+    report = ImportReport()
+    await session.execute(CreateTable(staging_table))
+    chunk = []
+    async for row_number, row, error in rows:
+        report.rows += 1
+        if error is not None:
+            report.reject(row_number, [{"loc": [], "msg": error}])
+            continue
+        try:
+            menu_item_schema = CreateMenuItemSchema.model_validate({**row, "food_place_id": food_place_id})
+        except ValidationError as validation_error:
+            report.reject(row_number, [{"loc": list(detail["loc"]), "msg": detail["msg"]}
+                                       for detail in validation_error.errors()])
+            continue
+        chunk.append((row_number, menu_item_schema.name, menu_item_schema.description, menu_item_schema.price))
+        if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+            await copy_chunk(session, chunk)
+            chunk = []
+    if chunk:
+        await copy_chunk(session, chunk)
+
+    latest = staging_table.select().distinct(staging_table.c.name).order_by(
+        staging_table.c.name, staging_table.c.row_number.desc()).subquery()
+    stmt = insert(MenuItem).from_select(
+        ["name", "description", "price", "food_place_id"],
+        select(latest.c.name, latest.c.description, latest.c.price, literal(food_place_id))
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="unique_name_with_food_place_id",
+        set_={"description": stmt.excluded.description, "price": stmt.excluded.price}
+    ).returning(MenuItem.id, literal_column("xmax = 0").label("inserted"))
+    for menu_item_id, inserted in (await session.execute(stmt)).all():
+        if inserted:
+            report.inserted += 1
+        else:
+            report.updated += 1
+            report.updated_ids.append(menu_item_id)
+    return report
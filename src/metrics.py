@@ -0,0 +1,115 @@
+import bisect
+import time
+
+from src.config import settings
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# First request latencies kept by StartupStats
+FIRST_REQUESTS = 10
+
+
+class Histogram:
+    """Fixed-bucket latency histogram in seconds."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.started_at = time.time()
+
+    def on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        self.checkins += 1
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "in_use": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "checkout_wait_seconds": self.checkout_wait.snapshot(),
+        }
+
+
+class StartupStats:
+    """Times of a worker's startup, from the lifespan start, and of its first requests."""
+
+    def __init__(self, fast_request_ms: float):
+        self.fast_request_ms = fast_request_ms
+        self.started = time.monotonic()
+        self.phases: dict[str, float] = {}
+        self.ready_seconds: float | None = None
+        self.first_requests: list[float] = []
+        self.first_fast_request_seconds: float | None = None
+
+    def observe_request(self, elapsed: float):
+        if len(self.first_requests) < FIRST_REQUESTS:
+            self.first_requests.append(elapsed)
+        if self.first_fast_request_seconds is None and elapsed * 1000 <= self.fast_request_ms:
+            self.first_fast_request_seconds = time.monotonic() - self.started
+
+    def stats(self) -> dict:
+        return {
+            "phases_seconds": self.phases,
+            "ready_seconds": self.ready_seconds,
+            "first_requests_ms": [elapsed * 1000 for elapsed in self.first_requests],
+            "first_fast_request_seconds": self.first_fast_request_seconds,
+        }
+
+
+startup_stats = StartupStats(settings.WARMUP_FAST_REQUEST_MS)
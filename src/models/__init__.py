@@ -2,9 +2,12 @@ from src.models.basket_item import BasketItem
 from src.models.food_basket import FoodBasket
 from src.models.food_place import FoodPlace
 from src.models.food_table import FoodTable
+from src.models.idempotency_key import IdempotencyKey
 from src.models.location import Location
 from src.models.menu_item import MenuItem
-from src.models.reservation import Reservation
+from src.models.outbox_event import OutboxEvent
+from src.models.rate_limit_bucket import RateLimitBucket
+from src.models.reservation import Reservation, ArchivedReservation
 from src.models.user import User
 
 from src.database import Base
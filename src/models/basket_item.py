@@ -1,6 +1,8 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, UniqueConstraint, CheckConstraint, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
@@ -11,12 +13,44 @@ while TYPE_CHECKING:
 
 class BasketItem(Base):
     __tablename__ = "basket_items"
+    __table_args__ = (
+        UniqueConstraint("food_basket_id", "menu_item_id", name="unique_menu_item_in_food_basket"),
+        CheckConstraint("item_quantity > 0", name="check_item_quantity_positive"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     item_quantity: Mapped[int] = mapped_column(default=1, nullable=False)
     menu_item_id: Mapped[int] = mapped_column(ForeignKey("menu_items.id", ondelete="CASCADE"), nullable=False)
-    food_basket_id: Mapped[int] = mapped_column(ForeignKey("food_baskets.id", ondelete="CASCADE"), nullable=False,
-                                                index=True)
+    # Lookups by basket use the unique (food_basket_id, menu_item_id) index
+    food_basket_id: Mapped[int] = mapped_column(ForeignKey("food_baskets.id", ondelete="CASCADE"), nullable=False)
 
     menu_item: Mapped["MenuItem"] = relationship("MenuItem", back_populates="basket_items")
     food_basket: Mapped["FoodBasket"] = relationship("FoodBasket", back_populates="basket_items")
+
+    @classmethod
+    async def add(cls, session: AsyncSession, food_basket_id: int, menu_item_id: int,
+                  item_quantity: int = 1) -> "BasketItem":
+        """Insert the item or increase its quantity if it is already in the basket."""
+        stmt = insert(cls).values(food_basket_id=food_basket_id, menu_item_id=menu_item_id,
+                                  item_quantity=item_quantity)
+        stmt = stmt.on_conflict_do_update(
+            constraint="unique_menu_item_in_food_basket",
+            set_={"item_quantity": cls.item_quantity + stmt.excluded.item_quantity}
+        ).returning(cls)
+        return await session.scalar(stmt, execution_options={"populate_existing": True})
+
+    @classmethod
+    async def remove(cls, session: AsyncSession, food_basket_id: int, menu_item_id: int,
+                     item_quantity: int | None = None) -> int | None:
+        """Decrease the quantity, deleting the row once it drops to zero or when no quantity is given.
+
+        Returns the remaining quantity, 0 if the row was deleted or None if the item is not in the basket.
+        """
+        where = (cls.food_basket_id == food_basket_id, cls.menu_item_id == menu_item_id)
+        if item_quantity is not None:
+            remaining = await session.scalar(update(cls).where(*where, cls.item_quantity > item_quantity).values(
+                item_quantity=cls.item_quantity - item_quantity).returning(cls.item_quantity))
+            if remaining is not None:
+                return remaining
+        deleted_id = await session.scalar(delete(cls).where(*where).returning(cls.id))
+        return None if deleted_id is None else 0
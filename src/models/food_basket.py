@@ -1,7 +1,8 @@
 import datetime as dt
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Index
+from sqlalchemy import ForeignKey, Index, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
@@ -34,3 +35,16 @@ class FoodBasket(Base):
     def mark_ordered(self):
         self.ordered_at = dt.datetime.now()
         self.is_ordered = True
+
+    @classmethod
+    async def open_basket_id(cls, session: AsyncSession, user_id: int, food_place_id: int) -> int:
+        """Id of the user's not yet ordered basket in the food place, created if there is none."""
+        food_basket_id = await session.scalar(
+            select(cls.id).where(cls.user_id == user_id, cls.food_place_id == food_place_id,
+                                 cls.is_ordered == False).order_by(cls.id).limit(1))
+        if food_basket_id is None:
+            food_basket = cls(food_place_id=food_place_id, user_id=user_id)
+            session.add(food_basket)
+            await session.flush()
+            food_basket_id = food_basket.id
+        return food_basket_id
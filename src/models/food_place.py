@@ -1,7 +1,8 @@
 import datetime as dt
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import ForeignKey, UniqueConstraint, Index, Computed, ColumnElement, Date, literal, case, and_, or_
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
@@ -14,6 +15,8 @@ class FoodPlace(Base):
     __tablename__ = "food_places"
     __table_args__ = (
         UniqueConstraint("name", "location_id", "address", name="unique_name_per_location_id_and_address"),
+        Index("food_places_search_vector_index", "search_vector", postgresql_using="gin"),
+        Index("food_places_name_trgm_index", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -22,7 +25,12 @@ class FoodPlace(Base):
     description: Mapped[str] = mapped_column(nullable=True)
     open_time: Mapped[dt.time] = mapped_column(nullable=False)
     close_time: Mapped[dt.time] = mapped_column(nullable=False)
-    location_id: Mapped[int] = mapped_column(ForeignKey("locations.id", ondelete="CASCADE"), nullable=False)
+    location_id: Mapped[int] = mapped_column(ForeignKey("locations.id", ondelete="CASCADE"), nullable=False,
+                                             index=True)
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR, Computed("setweight(to_tsvector('simple', name), 'A') || "
+                           "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+                           "setweight(to_tsvector('simple', address), 'C')", persisted=True), deferred=True)
     # Many To One
     location: Mapped["Location"] = relationship("Location", back_populates="food_places")
     # One To Many
@@ -31,3 +39,14 @@ class FoodPlace(Base):
                                                        cascade="all, delete-orphan", passive_deletes=True)
     menu_items: Mapped[list["MenuItem"]] = relationship("MenuItem", back_populates="food_place",
                                                         cascade="all, delete-orphan", passive_deletes=True)
+
+    @classmethod
+    def open_during(cls, start_datetime: dt.datetime, end_datetime: dt.datetime) -> ColumnElement[bool]:
+        """SQL counterpart of utils.in_working_time."""
+        conditions = []
+        for open_date in (start_datetime.date(), start_datetime.date() - dt.timedelta(days=1)):
+            close_date = case((cls.close_time < cls.open_time, literal(open_date + dt.timedelta(days=1), Date)),
+                              else_=literal(open_date, Date))
+            conditions.append(and_(literal(open_date, Date) + cls.open_time <= start_datetime,
+                                   end_datetime <= close_date + cls.close_time))
+        return or_(*conditions)
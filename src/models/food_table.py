@@ -1,6 +1,8 @@
+import datetime as dt
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import ForeignKey, UniqueConstraint, Index, select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
@@ -13,6 +15,7 @@ class FoodTable(Base):
     __tablename__ = "food_tables"
     __table_args__ = (
         UniqueConstraint("table_number", "food_place_id", name="unique_table_number_per_food_place_id"),
+        Index("food_place_id_max_seats_index", "food_place_id", "max_seats"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -23,3 +26,14 @@ class FoodTable(Base):
     food_place: Mapped["FoodPlace"] = relationship("FoodPlace", back_populates="food_tables")
     reservations: Mapped[list["Reservation"]] = relationship("Reservation", back_populates="food_table")
 
+    @classmethod
+    async def best_fit_ids(cls, session: AsyncSession, food_place_id: int, seats: int, start_datetime: dt.datetime,
+                           end_datetime: dt.datetime, exclude_ids: set[int], limit: int) -> list[int]:
+        """Ids of tables free for the whole interval, smallest sufficient table first."""
+        from src.models import Reservation
+        stmt = select(cls.id).where(
+            cls.food_place_id == food_place_id, cls.max_seats >= seats, cls.id.not_in(exclude_ids),
+            ~exists().where(Reservation.food_table_id == cls.id,
+                            Reservation.overlapping(start_datetime, end_datetime))
+        ).order_by(cls.max_seats, cls.table_number).limit(limit)
+        return list(await session.scalars(stmt))
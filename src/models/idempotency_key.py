@@ -0,0 +1,21 @@
+import datetime as dt
+
+from sqlalchemy import String, SmallInteger, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.database import Base
+
+
+class IdempotencyKey(Base):
+    """Response of a write request sent with an Idempotency-Key header, replayed to its retries until it expires.
+    A row without a status code is a request still in progress."""
+    __tablename__ = "idempotency_keys"
+
+    user_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    locked_at: Mapped[dt.datetime] = mapped_column(nullable=False)
+    expires_at: Mapped[dt.datetime] = mapped_column(nullable=False, index=True)
+    status_code: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
+    content_type: Mapped[str | None] = mapped_column(nullable=True)
+    body: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
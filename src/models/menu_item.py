@@ -1,6 +1,7 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, UniqueConstraint, Numeric
+from sqlalchemy import ForeignKey, UniqueConstraint, Index, Computed, Numeric
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
@@ -13,6 +14,8 @@ class MenuItem(Base):
     __tablename__ = "menu_items"
     __table_args__ = (
         UniqueConstraint("name", "food_place_id", name="unique_name_with_food_place_id"),
+        Index("menu_items_search_vector_index", "search_vector", postgresql_using="gin"),
+        Index("menu_items_name_trgm_index", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -20,6 +23,10 @@ class MenuItem(Base):
     price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     description: Mapped[str | None] = mapped_column(nullable=True)
     food_place_id: Mapped[int] = mapped_column(ForeignKey("food_places.id", ondelete="CASCADE"), nullable=False)
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR, Computed("setweight(to_tsvector('simple', name), 'A') || "
+                           "setweight(to_tsvector('simple', coalesce(description, '')), 'B')", persisted=True),
+        deferred=True)
 
     food_place: Mapped["FoodPlace"] = relationship("FoodPlace", back_populates="menu_items")
     basket_items: Mapped[list["BasketItem"]] = relationship("BasketItem", back_populates="menu_item",
@@ -0,0 +1,27 @@
+import datetime as dt
+
+from sqlalchemy import BigInteger, Index, String, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.database import Base
+
+
+class OutboxEvent(Base):
+    """Event written in the transaction of the change it describes and handled afterwards by src.outbox.
+
+    Handled events are deleted. A claimed event is hidden until ``available_at``, which is also when a failed
+    one is retried; after OUTBOX_MAX_ATTEMPTS it is kept with ``failed_at`` set."""
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index("ix_outbox_events_pending", "available_at", postgresql_where=text("failed_at IS NULL")),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    topic: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[dt.datetime] = mapped_column(nullable=False)
+    available_at: Mapped[dt.datetime] = mapped_column(nullable=False)
+    attempts: Mapped[int] = mapped_column(default=0, nullable=False)
+    last_error: Mapped[str | None] = mapped_column(nullable=True)
+    failed_at: Mapped[dt.datetime | None] = mapped_column(nullable=True)
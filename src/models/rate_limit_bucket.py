@@ -0,0 +1,18 @@
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.database import Base
+
+
+class RateLimitBucket(Base):
+    """Token buckets shared by the workers when RATE_LIMIT_BACKEND is "postgres". Unlogged: losing them in a crash
+    only refills them."""
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    tokens: Mapped[float] = mapped_column(nullable=False)
+    # Seconds since the epoch by the database clock, the same for all workers
+    updated_at: Mapped[float] = mapped_column(nullable=False, index=True)
+    # Whether the last request took a token
+    allowed: Mapped[bool] = mapped_column(nullable=False)
@@ -1,72 +1,168 @@
 import datetime as dt
-from typing import TYPE_CHECKING
+import enum
+from typing import TYPE_CHECKING, NamedTuple, Iterable
 
-from sqlalchemy import ForeignKey, CheckConstraint, select, not_, or_
+from sqlalchemy import (ForeignKey, CheckConstraint, PrimaryKeyConstraint, Index, Computed, ColumnElement, DateTime,
+                        select, func, insert, exists, literal, true, and_)
+from sqlalchemy.dialects.postgresql import TSRANGE, Range
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
+from src.utils import sqlstate, EXCLUSION_VIOLATION
 
 while TYPE_CHECKING:
     from src.models import FoodTable, User
 
+MIN_DURATION_IN_MINUTES = 30
+MAX_DURATION_IN_MINUTES = 240
+# Advisory lock class of the per-table locks taken by bookings near a month boundary
+PARTITION_BOUNDARY_LOCK = 8_412_020
+
+
+class BookingStatus(enum.Enum):
+    BOOKED = "booked"
+    TABLE_NOT_FOUND = "table_not_found"
+    TIME_OCCUPIED = "time_occupied"
+    OUTSIDE_WORKING_TIME = "outside_working_time"
+    CONFLICTS_WITH_BATCH = "conflicts_with_batch"
+    NOT_BOOKED = "not_booked"
+    NO_FREE_TABLE = "no_free_table"
+
+
+class BookingResult(NamedTuple):
+    status: BookingStatus
+    reservation: "Reservation | None" = None
+    food_place_id: int | None = None
+
 
 class Reservation(Base):
+    """Partitioned by month of start_datetime (see src.partitions), so the partition key is part of the primary key;
+    the overlap exclusion constraint is created on each partition."""
     __tablename__ = "reservations"
-    __table__args__ = (
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "start_datetime", name="reservations_pkey"),
         CheckConstraint("30 <= duration_in_minutes and duration_in_minutes <= 240", name="check_duration_range"),
+        Index("ix_reservations_user_id_id", "user_id", "id"),
+        {"postgresql_partition_by": "RANGE (start_datetime)"},
     )
 
-    id: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[int] = mapped_column(autoincrement=True)
     start_datetime: Mapped[dt.datetime] = mapped_column(nullable=False)
     duration_in_minutes: Mapped[int] = mapped_column(nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     food_table_id: Mapped[int] = mapped_column(ForeignKey("food_tables.id", ondelete="CASCADE"), nullable=False)
+    during: Mapped[Range[dt.datetime]] = mapped_column(
+        TSRANGE, Computed("tsrange(start_datetime, start_datetime + duration_in_minutes * interval '1 minute')",
+                          persisted=True), nullable=False)
 
     user: Mapped["User"] = relationship("User", back_populates="reservations")
     food_table: Mapped["FoodTable"] = relationship("FoodTable", back_populates="reservations")
 
-    @property
+    # Ids are unique on their own, so the ORM identifies rows by id alone
+    __mapper_args__ = {"primary_key": [id]}
+
+    @hybrid_property
     def end_datetime(self) -> dt.datetime:
         return self.start_datetime + dt.timedelta(minutes=self.duration_in_minutes)
 
-    async def time_is_free(self, session: AsyncSession) -> bool:
-        left = dt.datetime.combine(date=self.start_datetime.date(), time=dt.time(0, 0, 0))
-        right = left + dt.timedelta(days=2)
-        stmt = select(Reservation).where(
-            Reservation.food_table_id == self.food_table_id,
-            left <= Reservation.start_datetime,
-            Reservation.start_datetime <= right
-        )
-        reservations = (await session.execute(stmt)).scalars()
-        for reservation in reservations:
-            if not (
-                    self.start_datetime >= reservation.end_datetime or reservation.start_datetime >= self.end_datetime):
-                return False
-        return True
-
-    async def time_is_free_sql(self, session: AsyncSession) -> bool:
-        stmt = select(Reservation).where(
-            Reservation.food_table_id == self.food_table_id,
-            not_(
-                or_(self.start_datetime >= Reservation.end_datetime, Reservation.start_datetime >= self.end_datetime),
-            )
-        )
-        reservation = await session.execute(stmt)
-        return reservation.scalar_one_or_none() is None
-
-    async def reservation_in_working_time(self, session: AsyncSession) -> bool:
+    @end_datetime.inplace.expression
+    @classmethod
+    def _end_datetime_expression(cls) -> ColumnElement[dt.datetime]:
+        return func.upper(cls.during, type_=DateTime)
+
+    @classmethod
+    def overlapping(cls, start_datetime: dt.datetime, end_datetime: dt.datetime) -> ColumnElement[bool]:
+        # The bounds on start_datetime prune the partitions that cannot hold an overlapping reservation
+        return and_(cls.start_datetime > start_datetime - dt.timedelta(minutes=MAX_DURATION_IN_MINUTES),
+                    cls.start_datetime < end_datetime,
+                    cls.during.overlaps(func.tsrange(start_datetime, end_datetime, type_=TSRANGE)))
+
+    @staticmethod
+    def crosses_partitions(start_datetime: dt.datetime, end_datetime: dt.datetime) -> bool:
+        """Whether a reservation overlapping the interval may start in another month, that is in another partition
+        whose exclusion constraint does not see this one."""
+        earliest = start_datetime - dt.timedelta(minutes=MAX_DURATION_IN_MINUTES)
+        return (earliest.year, earliest.month) != (end_datetime.year, end_datetime.month)
+
+    @staticmethod
+    async def lock_partition_boundaries(session: AsyncSession, food_table_ids: Iterable[int]):
+        """Serialize bookings of the tables near a month boundary until the end of the transaction, which the
+        exclusion constraints of the single partitions cannot do."""
+        for food_table_id in sorted(food_table_ids):
+            await session.execute(select(func.pg_advisory_xact_lock(PARTITION_BOUNDARY_LOCK, food_table_id)))
+
+    @classmethod
+    async def book(cls, session: AsyncSession, start_datetime: dt.datetime, duration_in_minutes: int,
+                   food_table_id: int, user_id: int) -> BookingResult:
+        """Check the table, working time and overlaps and insert the reservation in a single statement.
+
+        Near a month boundary it first takes the table's boundary lock, so the session must be in a transaction.
+        """
+        from src.models import FoodTable, FoodPlace
+        end_datetime = start_datetime + dt.timedelta(minutes=duration_in_minutes)
+        if cls.crosses_partitions(start_datetime, end_datetime):
+            await cls.lock_partition_boundaries(session, [food_table_id])
+        checks = select(
+            FoodTable.id.label("food_table_id"),
+            FoodTable.food_place_id,
+            FoodPlace.open_during(start_datetime, end_datetime).label("in_working_time"),
+            ~exists().where(cls.food_table_id == FoodTable.id,
+                            cls.overlapping(start_datetime, end_datetime)).label("time_is_free"),
+        ).join(FoodTable.food_place).where(FoodTable.id == food_table_id).cte("checks")
+        inserted = insert(cls).from_select(
+            ["start_datetime", "duration_in_minutes", "user_id", "food_table_id"],
+            select(literal(start_datetime), literal(duration_in_minutes), literal(user_id),
+                   checks.c.food_table_id).where(checks.c.in_working_time, checks.c.time_is_free)
+        ).returning(cls.id).cte("inserted")
+        stmt = select(checks.c.food_place_id, checks.c.in_working_time, checks.c.time_is_free,
+                      inserted.c.id).select_from(checks).outerjoin(inserted, true())
+        row = (await session.execute(stmt)).one_or_none()
+        if row is None:
+            return BookingResult(BookingStatus.TABLE_NOT_FOUND)
+        if not row.time_is_free:
+            return BookingResult(BookingStatus.TIME_OCCUPIED)
+        if not row.in_working_time:
+            return BookingResult(BookingStatus.OUTSIDE_WORKING_TIME)
+        reservation = cls(id=row.id, start_datetime=start_datetime, duration_in_minutes=duration_in_minutes,
+                          food_table_id=food_table_id, user_id=user_id)
+        return BookingResult(BookingStatus.BOOKED, reservation, row.food_place_id)
+
+    @classmethod
+    async def book_best_fit(cls, session: AsyncSession, food_place_id: int, seats: int, start_datetime: dt.datetime,
+                            duration_in_minutes: int, user_id: int, candidates: int = 5) -> BookingResult:
+        """Book the smallest free table that seats the party.
+
+        Each candidate is booked in its own savepoint; a table taken meanwhile by a concurrent booking
+        is skipped and the next one is tried.
+        """
         from src.models import FoodTable
-        stmt = select(FoodTable).options(selectinload(FoodTable.food_place)).where(FoodTable.id == self.food_table_id)
-        food_table = (await session.execute(stmt)).scalar_one()
-        food_place = food_table.food_place
-        open_time = food_place.open_time
-        close_time = food_place.close_time
-        open_date = self.start_datetime.date()
-        if close_time < open_time:
-            close_date = open_date + dt.timedelta(days=1)
-        else:
-            close_date = open_date
-        open_datetime = dt.datetime.combine(date=open_date, time=open_time)
-        close_datetime = dt.datetime.combine(date=close_date, time=close_time)
-        return open_datetime <= self.start_datetime and self.end_datetime <= close_datetime
+        end_datetime = start_datetime + dt.timedelta(minutes=duration_in_minutes)
+        tried = set()
+        while food_table_ids := await FoodTable.best_fit_ids(session, food_place_id, seats, start_datetime,
+                                                             end_datetime, tried, candidates):
+            for food_table_id in food_table_ids:
+                tried.add(food_table_id)
+                try:
+                    async with session.begin_nested():
+                        result = await cls.book(session, start_datetime, duration_in_minutes, food_table_id, user_id)
+                except IntegrityError as error:
+                    if sqlstate(error) != EXCLUSION_VIOLATION:
+                        raise
+                    continue
+                if result.status is BookingStatus.BOOKED:
+                    return result
+        return BookingResult(BookingStatus.NO_FREE_TABLE)
+
+
+class ArchivedReservation(Base):
+    """Reservations of the partitions archived by src.partitions, without the overlap machinery."""
+    __tablename__ = "reservations_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    start_datetime: Mapped[dt.datetime] = mapped_column(nullable=False)
+    duration_in_minutes: Mapped[int] = mapped_column(nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    food_table_id: Mapped[int] = mapped_column(nullable=False)
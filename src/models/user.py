@@ -17,6 +17,10 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column(nullable=False)
     is_active: Mapped[bool] = mapped_column(default=True, nullable=False)
     is_admin: Mapped[bool] = mapped_column(default=False, nullable=False)
+    token_version: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False)
 
     reservations: Mapped[list["Reservation"]] = relationship("Reservation", back_populates="user")
     food_baskets: Mapped[list["FoodBasket"]] = relationship("FoodBasket", back_populates="user")
+
+    def bump_token_version(self):
+        self.token_version += 1
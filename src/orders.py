@@ -0,0 +1,33 @@
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import FoodBasket, BasketItem, MenuItem
+from src.outbox import enqueue, handles
+
+logger = logging.getLogger(__name__)
+
+BASKET_ORDERED = "basket.ordered"
+
+
+async def enqueue_order(session: AsyncSession, food_basket: FoodBasket):
+    """Queue the processing of an ordered basket, committed with the order itself."""
+    await enqueue(session, BASKET_ORDERED, {
+        "food_basket_id": food_basket.id,
+        "user_id": food_basket.user_id,
+        "food_place_id": food_basket.food_place_id,
+        "ordered_at": food_basket.ordered_at.isoformat(),
+    })
+
+
+@handles(BASKET_ORDERED)
+async def send_kitchen_ticket(session: AsyncSession, payload: dict):
+    """Price the ordered lines and pass the ticket on to the food place's kitchen."""
+    rows = (await session.execute(select(MenuItem.name, MenuItem.price, BasketItem.item_quantity).join(
+        MenuItem, MenuItem.id == BasketItem.menu_item_id
+    ).where(BasketItem.food_basket_id == payload["food_basket_id"]).order_by(MenuItem.name))).all()
+    total = sum(row.price * row.item_quantity for row in rows)
+    lines = ", ".join(f"{row.item_quantity} x {row.name}" for row in rows)
+    logger.info("Kitchen ticket of food place %d for basket %d ordered at %s: %s; total %s", payload["food_place_id"],
+                payload["food_basket_id"], payload["ordered_at"], lines or "no items", total)
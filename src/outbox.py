@@ -0,0 +1,173 @@
+import asyncio
+import datetime as dt
+import logging
+import random
+from typing import Awaitable, Callable, Collection
+
+from sqlalchemy import Row, select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database import engine, session_factory
+from src.metrics import Histogram
+from src.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0, 300.0, 3600.0)
+MAX_ERROR_LENGTH = 2000
+
+Handler = Callable[[AsyncSession, dict], Awaitable[None]]
+handlers: dict[str, Handler] = {}
+
+
+def handles(topic: str):
+    """Register the handler of a topic. It runs in a transaction that also deletes the event, so its database
+    changes are committed once; anything else it does must tolerate the event being handled again."""
+    def register(handler: Handler) -> Handler:
+        handlers[topic] = handler
+        return handler
+    return register
+
+
+async def enqueue(session: AsyncSession, topic: str, payload: dict):
+    """Add an event to the session, handled once the session's transaction commits."""
+    now = dt.datetime.now()
+    session.add(OutboxEvent(topic=topic, payload=payload, created_at=now, available_at=now))
+
+
+def backoff(attempts: int) -> dt.timedelta:
+    seconds = min(settings.OUTBOX_BACKOFF_MAX_SECONDS, settings.OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return dt.timedelta(seconds=seconds * random.uniform(0.5, 1))
+
+
+class OutboxWorker:
+    """Claims batches of due events with FOR UPDATE SKIP LOCKED, so workers of several processes share the outbox,
+    and handles each in its own transaction, at most OUTBOX_CONCURRENCY at once. A worker given ``topics`` only
+    claims and counts the events of those topics."""
+
+    def __init__(self, topics: Collection[str] | None = None):
+        self.topics = topics
+        self.wakeup = asyncio.Event()
+        self.in_flight = 0
+        self.handled = 0
+        self.retried = 0
+        self.failed = 0
+        self.handling_time = Histogram()
+        self.lag = Histogram(LAG_BUCKETS)
+
+    def of_topics(self) -> tuple:
+        return (OutboxEvent.topic.in_(self.topics),) if self.topics is not None else ()
+
+    def wake(self):
+        """Look for events now instead of at the next poll, e.g. after this process committed one."""
+        self.wakeup.set()
+
+    async def claim(self) -> list[Row]:
+        """Hide due events from other workers for OUTBOX_LEASE_SECONDS and return them."""
+        now = dt.datetime.now()
+        due = select(OutboxEvent.id).where(
+            OutboxEvent.failed_at.is_(None), OutboxEvent.available_at <= now, *self.of_topics()
+        ).order_by(OutboxEvent.available_at).limit(settings.OUTBOX_BATCH_SIZE).with_for_update(skip_locked=True)
+        claim = update(OutboxEvent).where(OutboxEvent.id.in_(due.scalar_subquery())).values(
+            available_at=now + dt.timedelta(seconds=settings.OUTBOX_LEASE_SECONDS), attempts=OutboxEvent.attempts + 1
+        ).returning(OutboxEvent.id, OutboxEvent.topic, OutboxEvent.payload, OutboxEvent.created_at,
+                    OutboxEvent.attempts)
+        async with engine.begin() as connection:
+            rows = (await connection.execute(claim)).all()
+        return sorted(rows, key=lambda row: row.id)
+
+    async def handle(self, event: Row, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            self.in_flight += 1
+            started = asyncio.get_running_loop().time()
+            try:
+                handler = handlers.get(event.topic)
+                if handler is None:
+                    raise LookupError(f"No handler for outbox topic {event.topic!r}")
+                async with session_factory() as session:
+                    await handler(session, event.payload)
+                    await session.execute(delete(OutboxEvent).where(OutboxEvent.id == event.id))
+                    await session.commit()
+            except Exception as error:
+                await self.release(event, error)
+            else:
+                self.handled += 1
+                self.lag.observe((dt.datetime.now() - event.created_at).total_seconds())
+            finally:
+                self.in_flight -= 1
+                self.handling_time.observe(asyncio.get_running_loop().time() - started)
+
+    async def release(self, event: Row, error: Exception):
+        """Schedule the retry of a failed event, or give it up after OUTBOX_MAX_ATTEMPTS."""
+        now = dt.datetime.now()
+        gave_up = event.attempts >= settings.OUTBOX_MAX_ATTEMPTS
+        logger.log(logging.ERROR if gave_up else logging.WARNING, "Outbox event %d (%s) failed on attempt %d%s",
+                   event.id, event.topic, event.attempts, ", giving up" if gave_up else "", exc_info=error)
+        async with engine.begin() as connection:
+            await connection.execute(update(OutboxEvent).where(OutboxEvent.id == event.id).values(
+                available_at=now + backoff(event.attempts), last_error=repr(error)[:MAX_ERROR_LENGTH],
+                failed_at=now if gave_up else None))
+        if gave_up:
+            self.failed += 1
+        else:
+            self.retried += 1
+
+    async def drain(self) -> int:
+        """Handle the due events batch by batch until none is left; returns how many were claimed."""
+        semaphore = asyncio.Semaphore(settings.OUTBOX_CONCURRENCY)
+        claimed = 0
+        while events := await self.claim():
+            claimed += len(events)
+            await asyncio.gather(*(self.handle(event, semaphore) for event in events))
+        return claimed
+
+    async def run(self, interval: float):
+        while True:
+            self.wakeup.clear()
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Claiming outbox events failed")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), interval)
+            except TimeoutError:
+                pass
+
+    async def backlog(self) -> dict:
+        """Pending and given up events in the database, and the age of the oldest pending one."""
+        async with engine.connect() as connection:
+            pending, oldest = (await connection.execute(select(func.count(), func.min(OutboxEvent.created_at)).where(
+                OutboxEvent.failed_at.is_(None), *self.of_topics()))).one()
+            failed = await connection.scalar(select(func.count()).where(OutboxEvent.failed_at.is_not(None),
+                                                                        *self.of_topics()))
+        return {
+            "pending": pending,
+            "failed": failed,
+            "oldest_pending_seconds": (dt.datetime.now() - oldest).total_seconds() if oldest else 0.0,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "handled": self.handled,
+            "retried": self.retried,
+            "failed": self.failed,
+            "handling_seconds": self.handling_time.snapshot(),
+            "lag_seconds": self.lag.snapshot(),
+        }
+
+
+outbox_worker = OutboxWorker()
+
+
+async def main():
+    import src.orders  # registers the handlers
+    claimed = await outbox_worker.drain()
+    print(f"Claimed {claimed} events: {outbox_worker.stats()}")
+    print(f"Backlog: {await outbox_worker.backlog()}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
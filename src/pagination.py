@@ -0,0 +1,48 @@
+from typing import Annotated
+
+from fastapi import Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from src.config import BaseSchema, settings
+from src.serialization import validate_rows
+
+
+class PageParams(BaseSchema):
+    after_id: int | None = None
+    limit: int = settings.DEFAULT_PAGE_SIZE
+    stream: bool = False
+
+
+def get_page_params(after_id: Annotated[int | None, Query(ge=0)] = None,
+                    limit: Annotated[int, Query(ge=1, le=settings.MAX_PAGE_SIZE)] = settings.DEFAULT_PAGE_SIZE,
+                    stream: bool = False) -> PageParams:
+    return PageParams(after_id=after_id, limit=limit, stream=stream)
+
+
+def paginate(stmt: Select, id_column: InstrumentedAttribute[int], page: "PageParams") -> Select:
+    if page.after_id is not None:
+        stmt = stmt.where(id_column > page.after_id)
+    stmt = stmt.order_by(id_column)
+    if not page.stream:
+        stmt = stmt.limit(page.limit)
+    return stmt
+
+
+def stream_ndjson(stmt: Select, schema: type[BaseSchema], session: AsyncSession) -> StreamingResponse:
+    """Stream the rows from the engine of the route's session, so recent writers keep reading from the primary."""
+    bind = session.bind
+
+    async def generate():
+        # The request session is closed before the body is sent, so the stream owns its session
+        async with AsyncSession(bind) as stream_session:
+            result = await stream_session.stream(stmt.execution_options(yield_per=settings.STREAM_CHUNK_SIZE))
+            async for partition in result.partitions():
+                yield "".join(item.model_dump_json() + "\n" for item in validate_rows(schema, partition))
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+page_dep = Annotated[PageParams, Depends(get_page_params)]
@@ -0,0 +1,140 @@
+import asyncio
+import datetime as dt
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "reservations"
+DEFAULT_PARTITION = "reservations_default"
+ARCHIVE_TABLE = "reservations_archive"
+PARTITION_NAME = re.compile(r"^reservations_y(\d{4})m(\d{2})$")
+RESERVATION_COLUMNS = "id, start_datetime, duration_in_minutes, user_id, food_table_id"
+# Key of the advisory lock that keeps concurrent maintenance runs of several workers apart
+MAINTENANCE_LOCK = 8_412_019
+# DDL on the parent waits behind running bookings; give up and retry on the next run instead of queueing them
+LOCK_TIMEOUT = "5s"
+
+
+def month_start(date: dt.date) -> dt.date:
+    return dt.date(date.year, date.month, 1)
+
+
+def add_months(month: dt.date, months: int) -> dt.date:
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return dt.date(year, month_index + 1, 1)
+
+
+def partition_name(month: dt.date) -> str:
+    return f"reservations_y{month.year:04d}m{month.month:02d}"
+
+
+async def existing_partitions(connection: AsyncConnection) -> dict[dt.date, str]:
+    """Monthly partitions attached to the reservations table, by their first day."""
+    names = await connection.scalars(text(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = CAST(:parent AS regclass)"
+    ), {"parent": PARENT_TABLE})
+    partitions = {}
+    for name in names:
+        if match := PARTITION_NAME.match(name):
+            partitions[dt.date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+async def create_partition(connection: AsyncConnection, month: dt.date) -> str:
+    """Create the partition of a month with its own exclusion constraint. Reservations already booked for that
+    month sit in the default partition and are moved over."""
+    name = partition_name(month)
+    bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    in_month = "start_datetime >= :start AND start_datetime < :end"
+    params = {"start": month, "end": add_months(month, 1)}
+    moved = await connection.scalar(text(f"SELECT EXISTS (SELECT FROM {DEFAULT_PARTITION} WHERE {in_month})"),
+                                    params)
+    if moved:
+        await connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    await connection.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}"))
+    await connection.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_exclude_overlapping "
+                                  f"EXCLUDE USING gist (food_table_id WITH =, during WITH &&)"))
+    if moved:
+        await connection.execute(text(f"INSERT INTO {name} ({RESERVATION_COLUMNS}) SELECT {RESERVATION_COLUMNS} "
+                                      f"FROM {DEFAULT_PARTITION} WHERE {in_month}"), params)
+        await connection.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"), params)
+        await connection.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    return name
+
+
+async def ensure_partitions(connection: AsyncConnection, months_ahead: int,
+                            today: dt.date | None = None) -> list[str]:
+    """Create the missing partitions from the current month up to ``months_ahead`` months later."""
+    current = month_start(today or dt.date.today())
+    partitions = await existing_partitions(connection)
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in partitions:
+            created.append(await create_partition(connection, month))
+    return created
+
+
+async def archive_partitions(connection: AsyncConnection, retention_months: int, mode: str,
+                             today: dt.date | None = None) -> list[str]:
+    """Detach the partitions of months that ended more than ``retention_months`` ago.
+
+    In the "archive" mode their rows are moved to the compact reservations_archive table and the partitions are
+    dropped; in the "detach" mode they are left as standalone tables, e.g. to be dumped and dropped offline.
+    """
+    cutoff = add_months(month_start(today or dt.date.today()), -retention_months)
+    archived = []
+    for month, name in sorted((await existing_partitions(connection)).items()):
+        if add_months(month, 1) > cutoff:
+            break
+        await connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        if mode == "archive":
+            await connection.execute(text(f"INSERT INTO {ARCHIVE_TABLE} ({RESERVATION_COLUMNS}) "
+                                          f"SELECT {RESERVATION_COLUMNS} FROM {name}"))
+            await connection.execute(text(f"DROP TABLE {name}"))
+        archived.append(name)
+    return archived
+
+
+async def maintain_partitions(engine: AsyncEngine) -> tuple[list[str], list[str]]:
+    """Create the upcoming partitions and archive the expired ones in one transaction.
+    Returns the created and archived partition names; nothing is done if another worker is running it."""
+    async with engine.begin() as connection:
+        if not await connection.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK}):
+            return [], []
+        await connection.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+        created = await ensure_partitions(connection, settings.RESERVATION_PARTITION_MONTHS_AHEAD)
+        archived = await archive_partitions(connection, settings.RESERVATION_RETENTION_MONTHS,
+                                            settings.RESERVATION_ARCHIVE_MODE)
+    return created, archived
+
+
+async def maintenance_loop(engine: AsyncEngine, interval: float):
+    while True:
+        try:
+            created, archived = await maintain_partitions(engine)
+        except Exception:
+            logger.exception("Reservation partition maintenance failed")
+        else:
+            if created or archived:
+                logger.info("Reservation partitions created: %s, archived: %s", created, archived)
+        await asyncio.sleep(interval)
+
+
+async def main():
+    from src.database import engine
+    created, archived = await maintain_partitions(engine)
+    print(f"Created: {', '.join(created) or '-'}")
+    print(f"Archived ({settings.RESERVATION_ARCHIVE_MODE}): {', '.join(archived) or '-'}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+import collections
+import logging
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config import settings
+from src.metrics import Histogram, startup_stats
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements = collections.Counter()
+
+    @property
+    def most_repeated(self) -> tuple[str, int]:
+        if not self.statements:
+            return "", 0
+        return self.statements.most_common(1)[0]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.db_time = Histogram()
+        self.query_count = Histogram(QUERY_COUNT_BUCKETS)
+        self.flagged = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "latency_seconds": self.latency.snapshot(),
+            "db_time_seconds": self.db_time.snapshot(),
+            "query_count": self.query_count.snapshot(),
+            "flagged": self.flagged,
+        }
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+route_stats: dict[str, RouteStats] = collections.defaultdict(RouteStats)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats.get()
+    if stats is None or not conn.info.get("query_started"):
+        return
+    stats.db_time += time.perf_counter() - conn.info["query_started"].pop()
+    stats.query_count += 1
+    stats.statements[statement] += 1
+
+
+class StackSampler:
+    """Samples the stack of one thread and aggregates it in folded format (flamegraph.pl / speedscope).
+
+    The event loop interleaves requests, so frames of concurrent requests can show up in a profile too.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.stacks.items()))
+
+
+class ProfilingMiddleware:
+    """Records per-route latency, query count and DB time and flags requests issuing too many queries.
+
+    Send ``X-Profile: 1`` (when PROFILE_HEADER_ENABLED) or set PROFILE_SAMPLE_RATE to write a stack profile
+    of the request into PROFILE_DIR.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def should_profile(self, scope) -> bool:
+        if settings.PROFILE_HEADER_ENABLED and (b"x-profile", b"1") in scope["headers"]:
+            return True
+        return random.random() < settings.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        sampler = None
+        if self.should_profile(scope):
+            sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000)
+            sampler.start()
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - stats.started
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(stats.query_count).encode()))
+                headers.append((b"server-timing", f"db;dur={stats.db_time * 1000:.1f}, "
+                                                  f"total;dur={elapsed * 1000:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            request_stats.reset(token)
+            self.record(scope, stats, sampler)
+
+    def record(self, scope, stats: RequestStats, sampler: StackSampler | None):
+        elapsed = time.perf_counter() - stats.started
+        route = scope.get("route")
+        name = f"{scope['method']} {route.path if route is not None else '<unmatched>'}"
+        metrics = route_stats[name]
+        metrics.latency.observe(elapsed)
+        startup_stats.observe_request(elapsed)
+        metrics.db_time.observe(stats.db_time)
+        metrics.query_count.observe(stats.query_count)
+        statement, repeats = stats.most_repeated
+        if stats.query_count > settings.PROFILE_QUERY_THRESHOLD or repeats > settings.PROFILE_REPEAT_THRESHOLD:
+            metrics.flagged += 1
+            logger.warning("%s issued %d queries in %.1f ms (%.1f ms in DB), most repeated %d times: %s",
+                           name, stats.query_count, elapsed * 1000, stats.db_time * 1000, repeats,
+                           " ".join(statement.split())[:200])
+        if sampler is not None:
+            sampler.stop()
+            path = Path(settings.PROFILE_DIR) / f"{time.time():.0f}-{name.replace('/', '_').replace(' ', '')}.folded"
+            sampler.dump(path)
+            logger.info("Profile of %s written to %s", name, path)
+
+
+def route_stats_snapshot() -> dict:
+    return {name: metrics.snapshot() for name, metrics in sorted(route_stats.items())}
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, case, delete, literal
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config import settings
+from src.database import engine, create_engine
+from src.models import RateLimitBucket
+from src.security import scope_user_id
+from src.utils import route_endpoint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = "default"
+LAG_INTERVAL_SECONDS = 0.1
+# Shared buckets idle for this long are full again and are deleted
+BUCKET_IDLE_SECONDS = 3600
+
+
+class Budget(NamedTuple):
+    rate: float
+    burst: int
+
+
+def rate_limit(budget: str = DEFAULT_BUDGET, low_priority: bool = False):
+    """Charge a route to a budget of RATE_LIMIT_BUDGETS; the routes naming the same budget share its bucket, while
+    the default one is counted per route. Low priority routes are shed first under load."""
+    def decorate(endpoint):
+        endpoint.rate_limit_budget = budget
+        endpoint.low_priority = low_priority
+        return endpoint
+    return decorate
+
+
+class LocalBackend:
+    """Token buckets of this process, least recently used ones dropped beyond ``maxsize``."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, budget: Budget) -> float:
+        """Takes a token; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.pop(key, (budget.burst, now))
+        tokens = min(budget.burst, tokens + (now - updated_at) * budget.rate)
+        allowed = tokens >= 1
+        self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+        while len(self.buckets) > self.maxsize:
+            self.buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / budget.rate
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class PostgresBackend:
+    """Token buckets shared by all workers, refilled and taken in a single upsert on a small pool of its own, so
+    that limiting does not wait for the connections it protects. Fails open if the database is unavailable."""
+
+    def __init__(self):
+        self.engine = None
+        self.cleaner: asyncio.Task | None = None
+
+    async def take(self, key: str, budget: Budget) -> float:
+        now = func.extract("epoch", func.clock_timestamp())
+        refilled = func.least(budget.burst, RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * budget.rate)
+        stmt = insert(RateLimitBucket).values(key=key, tokens=budget.burst - 1, updated_at=now, allowed=True)
+        stmt = stmt.on_conflict_do_update(index_elements=[RateLimitBucket.key], set_={
+            "tokens": refilled - case((refilled >= 1, 1), else_=0),
+            "updated_at": now,
+            "allowed": refilled >= 1,
+        }).returning(RateLimitBucket.tokens, RateLimitBucket.allowed)
+        try:
+            async with self.engine.begin() as connection:
+                tokens, allowed = (await connection.execute(stmt)).one()
+        except Exception:
+            logger.exception("Shared rate limit bucket unavailable, letting the request through")
+            return 0.0
+        return 0.0 if allowed else (1 - tokens) / budget.rate
+
+    async def clean(self):
+        while True:
+            await asyncio.sleep(BUCKET_IDLE_SECONDS / 4)
+            try:
+                async with self.engine.begin() as connection:
+                    await connection.execute(delete(RateLimitBucket).where(
+                        RateLimitBucket.updated_at < func.extract("epoch", func.clock_timestamp())
+                        - literal(BUCKET_IDLE_SECONDS)))
+            except Exception:
+                logger.exception("Deleting idle rate limit buckets failed")
+
+    async def start(self):
+        self.engine = create_engine(settings.db_url, "rate_limit", pool_size=settings.RATE_LIMIT_POOL_SIZE,
+                                    max_overflow=0)
+        self.cleaner = asyncio.create_task(self.clean())
+
+    async def stop(self):
+        if self.cleaner is not None:
+            self.cleaner.cancel()
+        if self.engine is not None:
+            await self.engine.dispose()
+
+
+class LoadMonitor:
+    """Event loop lag, measured by how late a periodic sleep wakes up, and primary pool utilization."""
+
+    def __init__(self):
+        self.loop_lag = 0.0
+        self.task: asyncio.Task | None = None
+
+    async def measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_INTERVAL_SECONDS)
+            self.loop_lag = max(0.0, loop.time() - started - LAG_INTERVAL_SECONDS)
+
+    def pool_utilization(self) -> float:
+        return engine.pool.checkedout() / (engine.pool.size() + settings.DB_MAX_OVERFLOW)
+
+    def overloaded(self) -> bool:
+        return (self.loop_lag * 1000 >= settings.SHED_LOOP_LAG_MS
+                or self.pool_utilization() >= settings.SHED_POOL_UTILIZATION)
+
+    async def start(self):
+        self.task = asyncio.create_task(self.measure())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+
+
+class RateLimiter:
+    def __init__(self):
+        self.backend = PostgresBackend() if settings.RATE_LIMIT_BACKEND == "postgres" else LocalBackend(
+            settings.RATE_LIMIT_MAX_KEYS)
+        self.load_monitor = LoadMonitor()
+        self.limited = 0
+        self.shed = 0
+
+    async def start(self):
+        await self.backend.start()
+        await self.load_monitor.start()
+
+    async def stop(self):
+        await self.load_monitor.stop()
+        await self.backend.stop()
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.RATE_LIMIT_BACKEND,
+            "limited": self.limited,
+            "shed": self.shed,
+            "loop_lag_ms": self.load_monitor.loop_lag * 1000,
+            "pool_utilization": self.load_monitor.pool_utilization(),
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+class RateLimitMiddleware:
+    """Token bucket per budget and client: the user id of a valid token, else the client address.
+
+    Routes use the "default" budget of RATE_LIMIT_BUDGETS, with a bucket of their own, unless ``@rate_limit``
+    names another one, whose bucket is shared by the routes naming it.
+    While the event loop lags or the pool is nearly exhausted, ``low_priority`` routes get 503 before
+    doing any work, leaving the capacity to the booking paths.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        endpoint = route_endpoint(scope)
+        if getattr(endpoint, "low_priority", False) and rate_limiter.load_monitor.overloaded():
+            rate_limiter.shed += 1
+            await JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"},
+                               content={"detail": "Server is busy, try again later"})(scope, receive, send)
+            return
+        budget_name = getattr(endpoint, "rate_limit_budget", DEFAULT_BUDGET)
+        bucket = budget_name
+        if budget_name == DEFAULT_BUDGET and endpoint is not None:
+            bucket = f"{budget_name}:{endpoint.__module__}.{endpoint.__name__}"
+        user_id = scope_user_id(scope)
+        client = f"user:{user_id}" if user_id is not None else f"ip:{(scope.get('client') or ('unknown',))[0]}"
+        retry_after = await rate_limiter.backend.take(f"{bucket}:{client}",
+                                                      Budget(*settings.RATE_LIMIT_BUDGETS[budget_name]))
+        if retry_after > 0:
+            rate_limiter.limited += 1
+            await JSONResponse(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                               headers={"Retry-After": str(math.ceil(retry_after))},
+                               content={"detail": "Too many requests, try again later"})(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
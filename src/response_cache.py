@@ -0,0 +1,145 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Annotated, Any, Awaitable, Callable, Iterable, NamedTuple
+
+from fastapi import Depends, Request, Response, status
+
+from src.config import settings
+from src.serialization import dump_json
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    tags: tuple[str, ...]
+    expires_at: float
+
+
+class ResponseCache:
+    """Pre-serialised GET bodies keyed by path and query, invalidated by tags after writes.
+
+    The cache is per process, so the TTL bounds how long other workers may serve a stale body. A body whose tags
+    were invalidated while it was being built may predate the write, so it is served but not stored."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict[str, CachedBody] = OrderedDict()
+        self.keys_by_tag: dict[str, set[str]] = {}
+        # Invalidation clock, and the last tick of each tag invalidated since the oldest build in progress started
+        self.clock = 0
+        self.invalidated_at: dict[str, int] = {}
+        self.building = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.stale_builds = 0
+
+    def get(self, key: str) -> CachedBody | None:
+        entry = self.entries.get(key)
+        if entry is None or entry.expires_at <= time.time():
+            if entry is not None:
+                self.discard(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def begin_build(self) -> int:
+        self.building += 1
+        return self.clock
+
+    def end_build(self):
+        self.building -= 1
+        if not self.building:
+            self.invalidated_at.clear()
+
+    def put(self, key: str, body: bytes, tags: Iterable[str], built_since: int | None = None) -> CachedBody:
+        """Store a body, unless one of its tags was invalidated after ``built_since`` from begin_build()."""
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        entry = CachedBody(body, etag, tuple(tags), time.time() + self.ttl_seconds)
+        if built_since is not None and any(self.invalidated_at.get(tag, 0) > built_since for tag in entry.tags):
+            self.stale_builds += 1
+            return entry
+        self.discard(key)
+        self.entries[key] = entry
+        for tag in entry.tags:
+            self.keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self.entries) > self.maxsize:
+            self.discard(next(iter(self.entries)))
+        return entry
+
+    def discard(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self.keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_tag[tag]
+
+    def invalidate(self, *tags: str):
+        self.clock += 1
+        for tag in tags:
+            if self.building:
+                self.invalidated_at[tag] = self.clock
+            for key in list(self.keys_by_tag.get(tag, ())):
+                self.discard(key)
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "tags": len(self.keys_by_tag),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "stale_builds": self.stale_builds,
+        }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class CachedResponder:
+    """Serves a route's body from the response cache, building it on a miss.
+
+    Cached bodies are shared by every client, so routes build them from the primary session (db_dep): a body
+    rebuilt from a lagging replica right after an invalidation would bring the old data back for the whole TTL."""
+
+    def __init__(self, request: Request):
+        self.request = request
+
+    async def respond(self, tags: Iterable[str] | Callable[[Any], Iterable[str]],
+                      build: Callable[[], Awaitable[Any]]) -> Response:
+        key = f"{self.request.url.path}?{'&'.join(sorted(f'{k}={v}' for k, v in self.request.query_params.items()))}"
+        entry = response_cache.get(key)
+        if entry is None:
+            started = response_cache.begin_build()
+            try:
+                data = await build()
+                entry = response_cache.put(key, dump_json(data), tags(data) if callable(tags) else tags, started)
+            finally:
+                response_cache.end_build()
+        headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(self.request.headers.get("if-none-match"), entry.etag):
+            response_cache.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+cached_responder_dep = Annotated[CachedResponder, Depends(CachedResponder)]
@@ -0,0 +1,40 @@
+import datetime as dt
+from typing import Literal
+
+from src.config import BaseSchema
+from src.schemas.food_place import FoodPlaceSchema
+
+
+class TableAvailabilitySchema(BaseSchema):
+    food_table_id: int
+    table_number: str
+    max_seats: int
+    start_times: list[dt.datetime]
+
+
+class AvailabilitySchema(BaseSchema):
+    food_place_id: int
+    date: dt.date
+    duration_in_minutes: int
+    open_datetime: dt.datetime
+    close_datetime: dt.datetime
+    food_tables: list[TableAvailabilitySchema]
+
+
+class AvailablePlaceSchema(FoodPlaceSchema):
+    free_tables: int
+
+
+class AvailablePlacesSchema(BaseSchema):
+    items: list[AvailablePlaceSchema]
+    next_cursor: str | None
+
+
+class AvailabilityEventSchema(BaseSchema):
+    id: str
+    type: Literal["reserved", "released"]
+    food_place_id: int
+    food_table_id: int
+    reservation_id: int
+    start_datetime: dt.datetime
+    end_datetime: dt.datetime
@@ -1,3 +1,8 @@
+from decimal import Decimal
+from typing import Annotated
+
+from pydantic import Field
+
 from src.config import BaseSchema
 from src.schemas.menu_item import MenuItemSchema
 
@@ -5,6 +10,7 @@ from src.schemas.menu_item import MenuItemSchema
 class CreateBasketItemSchema(BaseSchema):
     menu_item_id: int
     food_basket_id: int
+    item_quantity: Annotated[int, Field(default=1, ge=1)]
 
 
 class BasketItemSchema(CreateBasketItemSchema):
@@ -14,3 +20,10 @@ class BasketItemSchema(CreateBasketItemSchema):
 class ItemSchema():
     menu_item: MenuItemSchema
 
+
+class BasketLineSchema(BaseSchema):
+    menu_item_id: int
+    name: str
+    price: Decimal
+    item_quantity: int
+    line_total: Decimal
@@ -1,9 +1,10 @@
 import datetime as dt
+from decimal import Decimal
 from typing import Annotated
 from pydantic import Field
 
 from src.config import BaseSchema
-from src.schemas.basket_item import BasketItemSchema
+from src.schemas.basket_item import BasketItemSchema, BasketLineSchema
 
 
 class FoodBasketSchema(BaseSchema):
@@ -14,3 +15,9 @@ class FoodBasketSchema(BaseSchema):
 
 class ItemsFoodBasketSchema(FoodBasketSchema):
     items: list[BasketItemSchema]
+
+
+class FoodBasketSummarySchema(FoodBasketSchema):
+    food_place_id: int
+    items: list[BasketLineSchema]
+    total: Decimal
@@ -1,16 +1,15 @@
 import datetime as dt
-from typing import Annotated
+from typing import Annotated, Literal
 
 from pydantic import Field, field_validator
 
 from src.config import BaseSchema
 
 
-class DTCreateReservationSchema(BaseSchema):
+class DateTimeReservationSchema(BaseSchema):
     date: dt.date
     start_time: dt.time
     duration_in_minutes: Annotated[int, Field(ge=30, le=240)]
-    food_table_id: int
 
     @field_validator("start_time", mode="before")
     def parse_time(cls, v):
@@ -21,6 +20,18 @@ class DTCreateReservationSchema(BaseSchema):
                 raise ValueError("Time should be of the form Hours:Minutes")
         return v
 
+    @property
+    def start_datetime(self) -> dt.datetime:
+        return dt.datetime.combine(date=self.date, time=self.start_time)
+
+
+class DTCreateReservationSchema(DateTimeReservationSchema):
+    food_table_id: int
+
+
+class AutoCreateReservationSchema(DateTimeReservationSchema):
+    seats: Annotated[int, Field(ge=1)]
+
 
 class CreateReservationSchema(BaseSchema):
     start_datetime: dt.datetime
@@ -49,3 +60,16 @@ class ReservationSchema(CreateReservationSchema):
     id: int
     user_id: int
     end_datetime: dt.datetime
+
+
+class BatchCreateReservationSchema(BaseSchema):
+    reservations: Annotated[list[CreateReservationSchema | DTCreateReservationSchema],
+                            Field(min_length=1, max_length=100)]
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
+
+class BatchReservationResultSchema(BaseSchema):
+    index: int
+    status: str
+    detail: str | None = None
+    reservation: ReservationSchema | None = None
@@ -0,0 +1,27 @@
+from decimal import Decimal
+
+from src.config import BaseSchema
+from src.schemas.food_place import FoodPlaceSchema
+from src.schemas.menu_item import MenuItemSchema
+
+
+class FoodPlaceSearchResultSchema(FoodPlaceSchema):
+    rank: Decimal
+
+
+class MenuItemSearchResultSchema(MenuItemSchema):
+    rank: Decimal
+
+
+class FoodPlaceSearchSchema(BaseSchema):
+    items: list[FoodPlaceSearchResultSchema]
+    next_cursor: str | None
+    # More rows matched than the first SEARCH_MAX_CANDIDATES, which are ranked and paged through
+    truncated: bool
+
+
+class MenuItemSearchSchema(BaseSchema):
+    items: list[MenuItemSearchResultSchema]
+    next_cursor: str | None
+    # More rows matched than the first SEARCH_MAX_CANDIDATES, which are ranked and paged through
+    truncated: bool
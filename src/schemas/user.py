@@ -13,3 +13,9 @@ class UserSchema(CreateUserSchema):
 
 class AdminSchema(UserSchema):
     is_admin: bool
+    is_active: bool
+
+
+class UpdateUserRolesSchema(BaseSchema):
+    is_admin: bool | None = None
+    is_active: bool | None = None
@@ -0,0 +1,102 @@
+import re
+from decimal import Decimal
+
+from sqlalchemy import Select, ColumnElement, select, func, literal, cast, or_, and_, Numeric
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import FoodPlace, MenuItem
+
+WORD = re.compile(r"\w+")
+MAX_QUERY_WORDS = 8
+# Shorter prefixes expand to too many words of the index to be looked up quickly
+MIN_PREFIX_LENGTH = 3
+WORDS_MODE = "w"
+FUZZY_MODE = "f"
+
+
+class QueryTooBroadError(ValueError):
+    """The query has no word long enough to narrow the matches through the indexes."""
+
+
+def query_words(query: str) -> list[str]:
+    words = list(dict.fromkeys(WORD.findall(query.lower())))[:MAX_QUERY_WORDS]
+    if not any(len(word) >= MIN_PREFIX_LENGTH for word in words):
+        raise QueryTooBroadError(query)
+    return words
+
+
+def prefix_tsquery(words: list[str]) -> str:
+    """All words of the query required, the last one as a prefix while it is being typed: "pepperoni piz" ->
+    "pepperoni & piz:*". A last word shorter than MIN_PREFIX_LENGTH is matched whole."""
+    last = words[-1] + ":*" if len(words[-1]) >= MIN_PREFIX_LENGTH else words[-1]
+    return " & ".join(words[:-1] + [last])
+
+
+def ranked_stmt(model: type[FoodPlace] | type[MenuItem], match: ColumnElement[bool], score: ColumnElement,
+                after: tuple[Decimal, int] | None, limit: int, filters: tuple) -> Select:
+    """A page of (model, rank, truncated) rows, best first.
+
+    Only the first SEARCH_MAX_CANDIDATES matches in table order are ranked, so a broad query costs no more
+    than a narrow one; the trade-off is that its best matches may lie past them, which the truncated column
+    tells, computed from one candidate more. Pages are cut from the same candidates by (rank, id), with the rank
+    rounded so that it can be passed back exactly in the keyset cursor.
+    """
+    rank = func.round(cast(score, Numeric), 4).label("rank")
+    matches = select(model.id, rank).where(match, *filters).limit(settings.SEARCH_MAX_CANDIDATES + 1).subquery()
+    candidates = select(matches, func.row_number().over().label("position"),
+                        func.count().over().label("matched")).subquery()
+    page = select(candidates.c.id, candidates.c.rank,
+                  (candidates.c.matched > settings.SEARCH_MAX_CANDIDATES).label("truncated")).where(
+        candidates.c.position <= settings.SEARCH_MAX_CANDIDATES)
+    if after is not None:
+        after_rank, after_id = after
+        page = page.where(or_(candidates.c.rank < after_rank,
+                              and_(candidates.c.rank == after_rank, candidates.c.id > after_id)))
+    page = page.order_by(candidates.c.rank.desc(), candidates.c.id).limit(limit + 1).subquery()
+    return select(model, page.c.rank, page.c.truncated).join(page, page.c.id == model.id).order_by(
+        page.c.rank.desc(), model.id)
+
+
+def words_match(model: type[FoodPlace] | type[MenuItem], tsquery_text: str) -> tuple[ColumnElement, ColumnElement]:
+    tsquery = func.to_tsquery("simple", tsquery_text)
+    return model.search_vector.op("@@")(tsquery), func.ts_rank(model.search_vector, tsquery)
+
+
+def fuzzy_match(model: type[FoodPlace] | type[MenuItem], query: str) -> tuple[ColumnElement, ColumnElement]:
+    return literal(query).op("<%")(model.name), func.word_similarity(query, model.name)
+
+
+def parse_cursor(cursor: str | None) -> tuple[str | None, tuple[Decimal, int] | None]:
+    if cursor is None:
+        return None, None
+    mode, rank, id_ = cursor.split(":")
+    return mode, (Decimal(rank), int(id_))
+
+
+async def search(session: AsyncSession, model: type[FoodPlace] | type[MenuItem], query: str, cursor: str | None,
+                 limit: int, *filters) -> tuple[list[tuple], str | None, bool]:
+    """Rows of ``model`` matching all words of the query (tsvector index), or, when nothing matches them,
+    fuzzily matching the name (trigram index), best first. Returns (model, rank) rows, the next page cursor
+    and whether more rows matched than the SEARCH_MAX_CANDIDATES that are ranked.
+
+    Raises QueryTooBroadError for a query without a word of MIN_PREFIX_LENGTH characters."""
+    mode, after = parse_cursor(cursor)
+    words = query_words(query)
+    rows = []
+    if mode in (None, WORDS_MODE):
+        mode = WORDS_MODE
+        match, score = words_match(model, prefix_tsquery(words))
+        rows = (await session.execute(ranked_stmt(model, match, score, after, limit, filters))).all()
+    if mode == FUZZY_MODE or not rows and cursor is None:
+        mode = FUZZY_MODE
+        # Short words only add trigrams shared by most names
+        match, score = fuzzy_match(model, " ".join(word for word in words if len(word) >= MIN_PREFIX_LENGTH))
+        rows = (await session.execute(ranked_stmt(model, match, score, after, limit, filters))).all()
+    truncated = bool(rows) and rows[0].truncated
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, rank, _ = rows[-1]
+        next_cursor = f"{mode}:{rank}:{last.id}"
+    return [(row[0], row.rank) for row in rows], next_cursor, truncated
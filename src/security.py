@@ -4,16 +4,19 @@ from typing import Annotated
 import fastapi.security
 import jwt
 from fastapi import Depends, HTTPException, status
-from passlib.context import CryptContext
 from pydantic import Field
+from sqlalchemy import select
 
 from src.config import BaseSchema, settings
 from src.database import db_dep
+from src.hashing import password_hasher, HasherBusyError
 from src.models import User
+from src.ttl_cache import TTLCache
 
 oauth2_scheme = fastapi.security.OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL_SECONDS)
+role_cache = TTLCache(settings.ROLE_CACHE_SIZE, settings.ROLE_CACHE_TTL_SECONDS)
 
 
 class Header(BaseSchema):
@@ -24,14 +27,29 @@ class Header(BaseSchema):
 class Payload(BaseSchema):
     sub: str | None = Field(default=None)
     exp: dt.datetime | None = Field(default=None)
+    adm: bool = Field(default=False)
+    act: bool = Field(default=True)
+    ver: int = Field(default=0)
 
 
-def hash_password(password):
-    return pwd_context.hash(password)
+def hasher_busy():
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         detail="Too many password checks in progress, try again later",
+                         headers={"Retry-After": "1"})
 
 
-def verify_password(password, hashed_password):
-    return pwd_context.verify(password, hashed_password)
+async def hash_password(password):
+    try:
+        return await password_hasher.hash(password)
+    except HasherBusyError:
+        raise hasher_busy()
+
+
+async def verify_password(password, hashed_password):
+    try:
+        return await password_hasher.verify(password, hashed_password)
+    except HasherBusyError:
+        raise hasher_busy()
 
 
 def create_access_token(data: Payload | dict, expires_delta_minutes: int | None = 30):
@@ -45,13 +63,20 @@ def create_access_token(data: Payload | dict, expires_delta_minutes: int | None
             ...
         case _:
             raise TypeError("Payload must be of type dict or Payload")
-    payload = Payload(sub=sub, exp=exp)
+    claims = Payload.model_validate(data).model_dump(include={"adm", "act", "ver"})
+    payload = Payload(sub=sub, exp=exp, **claims)
     access_token = jwt.encode(payload=payload.model_dump(), key=settings.JWT_SECRET_KEY,
                               algorithm=settings.JWT_ALGORITHM)
     result = {"access_token": access_token, "token_type": "bearer"}
     return result
 
 
+def create_user_access_token(user: User):
+    return create_access_token(Payload(sub=str(user.id), adm=user.is_admin, act=user.is_active,
+                                       ver=user.token_version),
+                               expires_delta_minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
 def decode_access_token(token):
     return jwt.decode(jwt=token, key=settings.JWT_SECRET_KEY, algorithms=settings.JWT_ALGORITHM)
 
@@ -61,17 +86,48 @@ def only_authenticated(token: Annotated[str, Depends(oauth2_scheme)]):
 
 
 def get_payload(token: Annotated[str, Depends(oauth2_scheme)]):
-    payload = Payload(**decode_access_token(token))
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = Payload(**decode_access_token(token))
+        token_cache.put(token, payload, payload.exp.timestamp() if payload.exp else None)
     return payload
 
 
-def get_actual_user_id(payload: Annotated[Payload, Depends(get_payload)]):
+def scope_user_id(scope) -> int | None:
+    """User id of a valid bearer token of an ASGI request, for middlewares that run before the dependencies.
+    The token version and active flag are still checked by the route."""
+    scheme, _, token = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = get_payload(token)
+    except jwt.PyJWTError:
+        return None
+    return int(payload.sub) if payload.sub and payload.sub.isdigit() else None
+
+
+async def check_token_version(payload: Payload, session: db_dep):
+    token_version = role_cache.get(payload.sub)
+    if token_version is None:
+        token_version = await session.scalar(select(User.token_version).where(User.id == int(payload.sub)))
+        if token_version is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        role_cache.put(payload.sub, token_version)
+    if token_version != payload.ver:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+
+
+async def get_actual_user_id(payload: Annotated[Payload, Depends(get_payload)], session: db_dep):
+    if settings.ROLE_CACHE_TTL_SECONDS > 0:
+        await check_token_version(payload, session)
+    if not payload.act:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is inactive")
     return int(payload.sub)
 
 
-async def only_admin(user_id: Annotated[int, Depends(get_actual_user_id)], session: db_dep):
-    user = await session.get(User, user_id)
-    if user.is_admin:
+def only_admin(payload: Annotated[Payload, Depends(get_payload)],
+               user_id: Annotated[int, Depends(get_actual_user_id)]):
+    if payload.adm:
         return user_id
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                         detail="Access forbidden. This route is available only for admins.")
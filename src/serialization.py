@@ -0,0 +1,41 @@
+import functools
+from typing import Any, Iterable
+
+import orjson
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+from src.config import BaseSchema
+from src.database import Base
+
+
+@functools.cache
+def list_adapter(schema: type[BaseSchema]) -> TypeAdapter:
+    return TypeAdapter(list[schema])
+
+
+def schema_columns(model: type[Base], schema: type[BaseSchema]) -> list:
+    """Attributes of ``model`` named like the fields of ``schema``. Selecting them instead of the model returns
+    plain rows that validate into the schema without building ORM instances."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def validate_rows(schema: type[BaseSchema], rows: Iterable) -> list:
+    return list_adapter(schema).validate_python(list(rows), from_attributes=True)
+
+
+def list_response(schema: type[BaseSchema], rows: Iterable) -> Response:
+    """JSON array of rows validated once into ``schema`` and serialized straight to bytes, skipping the
+    response model validation and encoding FastAPI would do again on a returned list."""
+    return Response(content=list_adapter(schema).dump_json(validate_rows(schema, rows)), media_type="application/json")
+
+
+def encode_default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return jsonable_encoder(obj)
+
+
+def dump_json(data: Any) -> bytes:
+    return orjson.dumps(data, default=encode_default)
@@ -0,0 +1,26 @@
+import argparse
+
+import uvicorn
+
+from src.config import settings
+
+
+def serve(host: str = settings.SERVER_HOST, port: int = settings.SERVER_PORT, workers: int = settings.SERVER_WORKERS):
+    """Run the app in ``workers`` processes. Each one warms up in its lifespan before it accepts requests, and
+    on SIGTERM or SIGINT stops accepting, finishes the requests in flight and closes its pools."""
+    uvicorn.run("src.main:app", host=host, port=port, workers=workers, loop=settings.SERVER_LOOP,
+                http=settings.SERVER_HTTP, lifespan="on",
+                timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m src.server")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import datetime as dt
+from typing import Callable
+
+from sqlalchemy.exc import DBAPIError
+from starlette.routing import Match
+
+EXCLUSION_VIOLATION = "23P01"
+# Scope key of the endpoint resolved by route_endpoint
+ROUTE_ENDPOINT = "route_endpoint"
+
+
+def working_window(date: dt.date, open_time: dt.time, close_time: dt.time) -> tuple[dt.datetime, dt.datetime]:
+    if close_time < open_time:
+        close_date = date + dt.timedelta(days=1)
+    else:
+        close_date = date
+    return dt.datetime.combine(date=date, time=open_time), dt.datetime.combine(date=close_date, time=close_time)
+
+
+def in_working_time(start_datetime: dt.datetime, end_datetime: dt.datetime, open_time: dt.time,
+                    close_time: dt.time) -> bool:
+    """Whether the interval fits the hours that opened on its day or, for overnight hours, on the day before."""
+    for date in (start_datetime.date(), start_datetime.date() - dt.timedelta(days=1)):
+        open_datetime, close_datetime = working_window(date, open_time, close_time)
+        if open_datetime <= start_datetime and end_datetime <= close_datetime:
+            return True
+    return False
+
+
+def sqlstate(error: DBAPIError) -> str | None:
+    return getattr(error.orig, "sqlstate", None)
+
+
+def route_endpoint(scope) -> Callable | None:
+    """Endpoint of the route the router will pick for the request, for middlewares that run before routing.
+    Resolved once per request and kept in the scope for the next middleware."""
+    if ROUTE_ENDPOINT not in scope:
+        scope[ROUTE_ENDPOINT] = None
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match is Match.FULL:
+                scope[ROUTE_ENDPOINT] = getattr(route, "endpoint", None)
+                break
+    return scope[ROUTE_ENDPOINT]
@@ -0,0 +1,89 @@
+import asyncio
+import datetime as dt
+import logging
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import configure_mappers
+
+from src.availability import load_schedules
+from src.config import settings
+from src.database import engine, read_engine
+from src.metrics import startup_stats
+from src.models import FoodBasket, FoodPlace, FoodTable, Location, MenuItem, Reservation, User
+from src.pagination import PageParams, paginate
+from src.schemas.food_basket import FoodBasketSchema
+from src.schemas.food_place import FoodPlaceSchema
+from src.schemas.food_table import FoodTableSchema
+from src.schemas.location import LocationSchema
+from src.schemas.menu_item import MenuItemSchema
+from src.schemas.reservation import ReservationSchema
+from src.schemas.user import AdminSchema
+from src.serialization import list_adapter, schema_columns
+
+logger = logging.getLogger(__name__)
+
+# No row has this id: the hot statements are compiled and prepared without finding or changing anything
+MISSING_ID = 0
+LIST_SCHEMAS = (ReservationSchema, FoodPlaceSchema, FoodTableSchema, LocationSchema, MenuItemSchema, FoodBasketSchema,
+                AdminSchema)
+
+
+async def run_hot_statements(session: AsyncSession, writes: bool):
+    """The statements of the busiest routes, built by the same code, so their compiled forms are cached by the
+    engine and prepared on the session's connection."""
+    start_datetime = dt.datetime.combine(dt.date.today().replace(day=15), dt.time(12))
+    end_datetime = start_datetime + dt.timedelta(hours=1)
+    for model in (User, FoodPlace, FoodTable, Location, MenuItem, FoodBasket, Reservation):
+        await session.get(model, MISSING_ID)
+    await session.scalar(select(User.token_version).where(User.id == MISSING_ID))
+    await session.execute(paginate(select(*schema_columns(Reservation, ReservationSchema)).where(
+        Reservation.user_id == MISSING_ID), Reservation.id, PageParams()))
+    await load_schedules(session, [MISSING_ID], start_datetime, end_datetime)
+    await FoodTable.best_fit_ids(session, MISSING_ID, 1, start_datetime, end_datetime, set(),
+                                 settings.AUTO_BOOKING_CANDIDATES)
+    if writes:
+        await Reservation.book(session, start_datetime, 60, MISSING_ID, MISSING_ID)
+
+
+async def warm_up_engine(async_engine: AsyncEngine, connections: int, writes: bool):
+    """Open ``connections`` pool connections at once, so that they are distinct, and run the hot statements on
+    each in a transaction that is rolled back."""
+    async def warm_up_connection():
+        async with async_engine.connect() as connection:
+            async with AsyncSession(bind=connection) as session:
+                await run_hot_statements(session, writes)
+                await session.rollback()
+
+    await asyncio.gather(*(warm_up_connection() for _ in range(connections)))
+
+
+async def warm_up():
+    """Pay the first-request costs at startup: mapper configuration, response validators, pool connections and
+    statement compilation. A failure is logged and the worker starts cold."""
+    startup_stats.started = time.monotonic()
+    started = time.perf_counter()
+    configure_mappers()
+    startup_stats.phases["configure_mappers"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for schema in LIST_SCHEMAS:
+        list_adapter(schema)
+    startup_stats.phases["validators"] = time.perf_counter() - started
+
+    connections = min(settings.WARMUP_CONNECTIONS, settings.DB_POOL_SIZE)
+    started = time.perf_counter()
+    try:
+        await warm_up_engine(engine, connections, writes=True)
+        if read_engine is not engine:
+            await warm_up_engine(read_engine, connections, writes=False)
+    except Exception:
+        logger.exception("Warming up the connection pool failed, starting cold")
+    startup_stats.phases["connections"] = time.perf_counter() - started
+
+
+def mark_ready():
+    startup_stats.ready_seconds = time.monotonic() - startup_stats.started
+    logger.info("Worker ready in %.2fs (%s)", startup_stats.ready_seconds,
+                ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in startup_stats.phases.items()))
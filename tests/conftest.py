@@ -0,0 +1,71 @@
+import datetime as dt
+import os
+import secrets
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from pydantic import ValidationError
+from sqlalchemy import delete
+from sqlalchemy.exc import DBAPIError
+
+# Without settings in .env or the environment, placeholders let the tests that need no database run, and the
+# tests using the postgres fixture are skipped
+PLACEHOLDER_SETTINGS = {
+    "DB_HOST": "localhost", "DB_PORT": "5432", "DB_USER": "postgres", "DB_PASS": "postgres", "DB_NAME": "postgres",
+    "JWT_SECRET_KEY": "test-secret", "JWT_ALGORITHM": "HS256",
+}
+try:
+    import src.config
+    DATABASE_CONFIGURED = True
+except ValidationError:
+    os.environ.update(PLACEHOLDER_SETTINGS)
+    DATABASE_CONFIGURED = False
+
+from src.database import engine
+
+
+@pytest_asyncio.fixture
+async def postgres():
+    """The database of the app's settings, migrated to head. Tests only change rows they created."""
+    if not DATABASE_CONFIGURED:
+        pytest.skip("No database configured")
+    try:
+        async with engine.connect():
+            pass
+    except (OSError, DBAPIError) as error:
+        pytest.skip(f"Database unavailable: {error}")
+    yield
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def dispose_engine():
+    """Each test has its own event loop, which pooled asyncpg connections cannot outlive."""
+    yield
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def food_place(postgres):
+    """A food place open 10:00-22:00 with tables of 2, 4 and 6 seats, and a user to book them; removed afterwards
+    together with their reservations."""
+    from src.database import session_factory
+    from src.models import Location, FoodPlace, FoodTable, User
+    suffix = secrets.token_hex(4)
+    async with session_factory() as session:
+        location = Location(name=f"test.location.{suffix}")
+        place = FoodPlace(name=f"test.place.{suffix}", address="address", description="description",
+                          open_time=dt.time(10), close_time=dt.time(22), location=location)
+        tables = [FoodTable(table_number=str(max_seats), max_seats=max_seats, food_place=place)
+                  for max_seats in (2, 4, 6)]
+        user = User(name=f"test.user.{suffix}", hashed_password="-")
+        session.add_all([location, place, *tables, user])
+        await session.flush()
+        created = SimpleNamespace(id=place.id, location_id=location.id, table_ids=[table.id for table in tables],
+                                  user_id=user.id)
+        await session.commit()
+    yield created
+    async with session_factory() as session:
+        await session.execute(delete(Location).where(Location.id == created.location_id))
+        await session.execute(delete(User).where(User.id == created.user_id))
+        await session.commit()
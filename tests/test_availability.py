@@ -0,0 +1,92 @@
+import datetime as dt
+
+import httpx
+import pytest
+
+from src.availability import TableSchedule
+from src.database import session_factory
+from src.main import app
+from src.models import FoodPlace, FoodTable, Reservation
+from src.security import Payload, create_access_token
+
+DAY = dt.datetime(2030, 12, 10)
+STEP = dt.timedelta(minutes=30)
+HOUR = dt.timedelta(hours=1)
+
+
+def at(hour: float) -> dt.datetime:
+    return DAY + dt.timedelta(hours=hour)
+
+
+def schedule(*intervals: tuple[float, float]) -> TableSchedule:
+    table_schedule = TableSchedule()
+    for start, end in intervals:
+        table_schedule.add(at(start), at(end))
+    return table_schedule
+
+
+def test_touching_and_overlapping_intervals_merge():
+    table_schedule = schedule((12, 13), (15, 16), (13, 14), (15.5, 17), (9, 10))
+    assert list(zip(table_schedule.starts, table_schedule.ends)) == [(at(9), at(10)), (at(12), at(14)),
+                                                                     (at(15), at(17))]
+
+
+def test_is_free_allows_back_to_back_bookings():
+    table_schedule = schedule((12, 14))
+    assert table_schedule.is_free(at(10), at(12)) and table_schedule.is_free(at(14), at(15))
+    assert not table_schedule.is_free(at(11), at(12.5))
+    assert not table_schedule.is_free(at(12.5), at(13))
+    assert not table_schedule.is_free(at(11), at(15))
+
+
+def test_free_starts_skip_busy_intervals_on_the_grid():
+    table_schedule = schedule((12, 13), (14.25, 15))
+    assert table_schedule.free_starts(at(10), at(16), HOUR, STEP) == [
+        at(10), at(10.5), at(11), at(13), at(15)]
+
+
+def test_free_starts_of_an_empty_schedule_fill_the_window():
+    assert TableSchedule().free_starts(at(10), at(12), HOUR, STEP) == [at(10), at(10.5), at(11)]
+    assert TableSchedule().free_starts(at(10), at(10.5), HOUR, STEP) == []
+
+
+async def add_place(location_id: int, name: str, open_hour: int, seats: list[int]) -> int:
+    async with session_factory() as session:
+        place = FoodPlace(name=name, address="address", description="description", open_time=dt.time(open_hour),
+                          close_time=dt.time(22), location_id=location_id)
+        session.add_all([place, *(FoodTable(table_number=str(number), max_seats=max_seats, food_place=place)
+                                  for number, max_seats in enumerate(seats, 1))])
+        await session.flush()
+        place_id = place.id
+        await session.commit()
+    return place_id
+
+
+@pytest.mark.asyncio
+async def test_available_places_rank_by_free_tables_and_page_by_cursor(food_place):
+    location_id = food_place.location_id
+    one_table = await add_place(location_id, f"{food_place.id}.one", 10, [4, 2])
+    tied = await add_place(location_id, f"{food_place.id}.tied", 10, [6, 8])
+    await add_place(location_id, f"{food_place.id}.closed", 18, [4, 4, 4])
+    async with session_factory() as session:
+        # Takes the food place's 4-seat table at 12:30, overlapping the searched 12:00-13:00
+        session.add(Reservation(start_datetime=at(12.5), duration_in_minutes=60, food_table_id=food_place.table_ids[1],
+                                user_id=food_place.user_id))
+        await session.commit()
+
+    token = create_access_token(Payload(sub=str(food_place.user_id)))["access_token"]
+    params = {"at": at(12).isoformat(), "duration": 60, "seats": 3, "limit": 2}
+    pages = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        while True:
+            response = await client.get(f"/api/locations/{location_id}/available_places", params=params)
+            assert response.status_code == 200
+            pages.append(response.json())
+            if not pages[-1]["next_cursor"]:
+                break
+            params["cursor"] = pages[-1]["next_cursor"]
+
+    assert [[(item["id"], item["free_tables"]) for item in page["items"]] for page in pages] == [
+        [(tied, 2), (food_place.id, 1)], [(one_table, 1)]]
+    assert pages[0]["next_cursor"] == f"1:{food_place.id}"
@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+
+from src.api_routers.food_basket import add_to_open_basket, get_food_basket_summary
+from src.database import session_factory
+from src.models import BasketItem, MenuItem
+
+pytestmark = [pytest.mark.asyncio]
+
+
+@pytest_asyncio.fixture
+async def menu_item_ids(food_place):
+    async with session_factory() as session:
+        menu_items = [MenuItem(name="Soup", price=Decimal("4.50"), food_place_id=food_place.id),
+                      MenuItem(name="Tea", price=Decimal("1.20"), food_place_id=food_place.id)]
+        session.add_all(menu_items)
+        await session.flush()
+        menu_item_ids = [menu_item.id for menu_item in menu_items]
+        await session.commit()
+    return menu_item_ids
+
+
+async def test_adding_an_item_again_merges_the_quantities(food_place, menu_item_ids):
+    soup_id, tea_id = menu_item_ids
+    async with session_factory() as session:
+        first = await add_to_open_basket(session, food_place.user_id, soup_id, 1)
+        first_id, food_basket_id = first.id, first.food_basket_id
+        again = await add_to_open_basket(session, food_place.user_id, soup_id, 2)
+        assert (again.id, again.food_basket_id, again.item_quantity) == (first_id, food_basket_id, 3)
+        await add_to_open_basket(session, food_place.user_id, tea_id, 1)
+        await session.commit()
+
+        summary = await get_food_basket_summary(food_basket_id, session, food_place.user_id)
+    assert [(item.name, item.item_quantity, item.line_total) for item in summary.items] == [
+        ("Soup", 3, Decimal("13.50")), ("Tea", 1, Decimal("1.20"))]
+    assert summary.total == Decimal("14.70")
+
+
+async def test_removing_decrements_and_deletes_at_zero(food_place, menu_item_ids):
+    soup_id, _ = menu_item_ids
+    async with session_factory() as session:
+        basket_item = await add_to_open_basket(session, food_place.user_id, soup_id, 3)
+        food_basket_id = basket_item.food_basket_id
+        assert await BasketItem.remove(session, food_basket_id, soup_id, 2) == 1
+        assert await BasketItem.remove(session, food_basket_id, soup_id, 5) == 0
+        assert await BasketItem.remove(session, food_basket_id, soup_id) is None
+        await session.rollback()
@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select
+
+from src.config import settings
+from src.database import session_factory
+from src.idempotency import idempotency_store
+from src.main import app
+from src.models import IdempotencyKey, Reservation
+from src.security import Payload, create_access_token
+from src.utils import route_endpoint, ROUTE_ENDPOINT
+
+pytestmark = [pytest.mark.asyncio]
+
+
+@pytest_asyncio.fixture
+async def client(food_place):
+    await idempotency_store.start()
+    token = create_access_token(Payload(sub=str(food_place.user_id)))["access_token"]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        yield client
+    async with idempotency_store.engine.connect() as connection:
+        await connection.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id == food_place.user_id))
+    await idempotency_store.stop()
+
+
+def reservation_json(food_place, hour: int = 12) -> dict:
+    return {"start_datetime": f"10.12.2030 {hour}:00", "duration_in_minutes": 60,
+            "food_table_id": food_place.table_ids[0]}
+
+
+async def reservations_of(user_id: int) -> int:
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).where(Reservation.user_id == user_id))
+
+
+async def test_retry_replays_the_first_response(client, food_place):
+    headers = {"Idempotency-Key": "retry"}
+    first = await client.post("/api/reservations", json=reservation_json(food_place), headers=headers)
+    retry = await client.post("/api/reservations", json=reservation_json(food_place), headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert "idempotent-replayed" not in first.headers and retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert await reservations_of(food_place.user_id) == 1
+
+
+async def test_key_reused_for_another_request_is_rejected(client, food_place):
+    headers = {"Idempotency-Key": "reused"}
+    await client.post("/api/reservations", json=reservation_json(food_place), headers=headers)
+    response = await client.post("/api/reservations", json=reservation_json(food_place, 15), headers=headers)
+    assert response.status_code == 422
+    assert await reservations_of(food_place.user_id) == 1
+
+
+async def test_retry_of_a_request_in_progress_gets_409(client, food_place, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    booking, finish = asyncio.Event(), asyncio.Event()
+    book = Reservation.book.__func__
+
+    async def slow_book(cls, *args, **kwargs):
+        booking.set()
+        await finish.wait()
+        return await book(cls, *args, **kwargs)
+
+    monkeypatch.setattr(Reservation, "book", classmethod(slow_book))
+    headers = {"Idempotency-Key": "in-progress"}
+    first = asyncio.create_task(client.post("/api/reservations", json=reservation_json(food_place), headers=headers))
+    await booking.wait()
+    retry = await client.post("/api/reservations", json=reservation_json(food_place), headers=headers)
+    finish.set()
+    assert retry.status_code == 409 and retry.headers["retry-after"] == "1"
+    assert (await first).status_code == 200
+    assert await reservations_of(food_place.user_id) == 1
+
+
+async def test_route_endpoint_is_resolved_once_per_request():
+    scope = {"type": "http", "method": "POST", "path": "/api/reservations", "root_path": "", "app": app}
+    endpoint = route_endpoint(scope)
+    assert scope[ROUTE_ENDPOINT] is endpoint and endpoint.idempotent
+    # The next middleware reads it from the scope without scanning the routes again
+    scope["app"] = None
+    assert route_endpoint(scope) is endpoint
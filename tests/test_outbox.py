@@ -0,0 +1,124 @@
+import datetime as dt
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select, update
+
+from src.config import settings
+from src.database import engine, session_factory
+from src.models import Location, OutboxEvent
+from src.outbox import OutboxWorker, backoff, enqueue, handlers
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.usefixtures("postgres")]
+
+# Workers of the tests only see these topics, so events of the database's own pipeline are left alone
+TOPICS = ("test.a", "test.b", "test.c", "test.failing", "test.add_location", "test.add_location_and_fail")
+LOCATION_NAME = "outbox test location"
+
+
+async def delete_test_rows():
+    async with engine.begin() as connection:
+        await connection.execute(delete(OutboxEvent).where(OutboxEvent.topic.in_(TOPICS)))
+        await connection.execute(delete(Location).where(Location.name == LOCATION_NAME))
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def test_rows(postgres):
+    await delete_test_rows()
+    yield
+    await delete_test_rows()
+
+
+async def add_events(*topics: str) -> list[int]:
+    async with session_factory() as session:
+        for topic in topics:
+            await enqueue(session, topic, {})
+        await session.commit()
+        return list(await session.scalars(select(OutboxEvent.id).where(OutboxEvent.topic.in_(topics)).order_by(
+            OutboxEvent.id)))
+
+
+async def load_event(event_id: int) -> OutboxEvent | None:
+    async with session_factory() as session:
+        return await session.get(OutboxEvent, event_id)
+
+
+async def failing_handler(session, payload: dict):
+    raise RuntimeError("kitchen is down")
+
+
+async def test_claim_leases_events_and_skips_locked_ones():
+    first, *others = await add_events("test.a", "test.b", "test.c")
+    worker = OutboxWorker(TOPICS)
+    async with engine.connect() as connection:
+        async with connection.begin():
+            await connection.execute(select(OutboxEvent.id).where(OutboxEvent.id == first).with_for_update())
+            claimed_at = dt.datetime.now()
+            claimed = await worker.claim()
+    assert [event.id for event in claimed] == others
+    assert all(event.attempts == 1 for event in claimed)
+    leased_until = claimed_at + dt.timedelta(seconds=settings.OUTBOX_LEASE_SECONDS - 1)
+    for event in claimed:
+        assert (await load_event(event.id)).available_at > leased_until
+    # Leased events stay hidden, the one that was locked is claimed once its lock is gone
+    assert [event.id for event in await worker.claim()] == [first]
+
+
+async def test_failed_event_backs_off_and_counts_attempts(monkeypatch):
+    monkeypatch.setitem(handlers, "test.failing", failing_handler)
+    [event_id] = await add_events("test.failing")
+    worker = OutboxWorker(TOPICS)
+    for attempt in (1, 2):
+        await worker.drain()
+        event = await load_event(event_id)
+        assert event.attempts == attempt
+        assert event.available_at > dt.datetime.now()
+        assert event.failed_at is None
+        assert "kitchen is down" in event.last_error
+        async with engine.begin() as connection:
+            await connection.execute(update(OutboxEvent).where(OutboxEvent.id == event_id).values(
+                available_at=dt.datetime.now()))
+    assert worker.retried == 2
+    assert worker.handled == 0
+    assert backoff(1) <= dt.timedelta(seconds=settings.OUTBOX_BACKOFF_SECONDS)
+    assert backoff(3) >= dt.timedelta(seconds=settings.OUTBOX_BACKOFF_SECONDS * 2)
+    assert backoff(100) <= dt.timedelta(seconds=settings.OUTBOX_BACKOFF_MAX_SECONDS)
+
+
+async def test_event_is_given_up_after_max_attempts(monkeypatch):
+    monkeypatch.setitem(handlers, "test.failing", failing_handler)
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "OUTBOX_BACKOFF_SECONDS", 0)
+    [event_id] = await add_events("test.failing")
+    worker = OutboxWorker(TOPICS)
+    assert await worker.drain() == 3
+    event = await load_event(event_id)
+    assert event.attempts == 3
+    assert event.failed_at is not None
+    assert (worker.retried, worker.failed) == (2, 1)
+    assert await worker.drain() == 0
+    backlog = await worker.backlog()
+    assert (backlog["pending"], backlog["failed"]) == (0, 1)
+
+
+async def test_event_is_deleted_with_the_changes_of_its_handler(monkeypatch):
+    async def add_location(session, payload: dict):
+        session.add(Location(name=LOCATION_NAME))
+
+    async def add_location_and_fail(session, payload: dict):
+        await add_location(session, payload)
+        await session.flush()
+        raise RuntimeError("kitchen is down")
+
+    monkeypatch.setitem(handlers, "test.add_location", add_location)
+    monkeypatch.setitem(handlers, "test.add_location_and_fail", add_location_and_fail)
+    [failing_id, handled_id] = await add_events("test.add_location_and_fail", "test.add_location")
+    # One at a time: the second handler's insert only succeeds if the first one's was rolled back with its failure
+    monkeypatch.setattr(settings, "OUTBOX_CONCURRENCY", 1)
+    worker = OutboxWorker(TOPICS)
+    await worker.drain()
+    assert await load_event(handled_id) is None
+    assert (await load_event(failing_id)).attempts == 1
+    async with session_factory() as session:
+        assert await session.scalar(select(Location.id).where(Location.name == LOCATION_NAME)) is not None
+    assert (worker.handled, worker.retried) == (1, 1)
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import select
+
+from src.database import session_factory
+from src.models import FoodTable
+from src.pagination import PageParams, paginate
+
+
+def test_streamed_pages_are_ordered_but_not_limited():
+    sql = str(paginate(select(FoodTable.id), FoodTable.id, PageParams(after_id=5, limit=2, stream=True)))
+    assert "WHERE food_tables.id >" in sql and sql.endswith("ORDER BY food_tables.id")
+
+
+@pytest.mark.asyncio
+async def test_pages_continue_after_the_last_id(food_place):
+    stmt = select(FoodTable.id).where(FoodTable.food_place_id == food_place.id)
+    ids, after_id = [], None
+    async with session_factory() as session:
+        while True:
+            page = (await session.scalars(paginate(stmt, FoodTable.id, PageParams(after_id=after_id, limit=2)))).all()
+            if not page:
+                break
+            assert len(page) <= 2
+            ids += page
+            after_id = page[-1]
+    assert ids == sorted(food_place.table_ids)
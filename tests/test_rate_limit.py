@@ -0,0 +1,73 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from src import rate_limit as rate_limit_module
+from src.config import settings
+from src.rate_limit import Budget, LocalBackend, RateLimitMiddleware, rate_limit, rate_limiter
+
+BUDGET = Budget(rate=2, burst=3)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.mark.asyncio
+async def test_bucket_refills_at_its_rate_up_to_the_burst(clock):
+    backend = LocalBackend(10)
+    assert [await backend.take("key", BUDGET) for _ in range(4)] == [0, 0, 0, 0.5]
+    clock[0] += 0.25
+    assert await backend.take("key", BUDGET) == 0.25
+    clock[0] += 0.25
+    assert await backend.take("key", BUDGET) == 0
+    clock[0] += 60
+    assert [await backend.take("key", BUDGET) for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_buckets_are_dropped(clock):
+    backend = LocalBackend(2)
+    for key in ("first", "second", "first", "third"):
+        await backend.take(key, BUDGET)
+    assert list(backend.buckets) == ["first", "third"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "backend", LocalBackend(10))
+    monkeypatch.setattr(settings, "RATE_LIMIT_BUDGETS", {"default": (0.5, 2), "bulk": (1, 5)})
+    app = FastAPI()
+
+    @app.get("/booking")
+    async def booking():
+        return {}
+
+    @app.get("/report")
+    @rate_limit("bulk", low_priority=True)
+    async def report():
+        return {}
+
+    app.add_middleware(RateLimitMiddleware)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_gets_429_with_retry_after(client):
+    responses = [await client.get("/booking") for _ in range(3)]
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[-1].headers["Retry-After"] == "2"
+    assert (await client.get("/report")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_low_priority_routes_are_shed_under_load(client, monkeypatch):
+    monkeypatch.setattr(rate_limiter.load_monitor, "overloaded", lambda: True)
+    shed = rate_limiter.shed
+    response = await client.get("/report")
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    assert (await client.get("/booking")).status_code == 200
+    assert rate_limiter.shed == shed + 1
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src import database
+from src.config import BaseSchema, settings
+from src.pagination import stream_ndjson
+from src.security import Payload, create_access_token
+from src.ttl_cache import TTLCache
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.usefixtures("postgres")]
+
+READ_AFTER_WRITE_SECONDS = 0.2
+
+
+@pytest.fixture(autouse=True)
+def replica(monkeypatch):
+    # A second engine on the local database stands in for the replica; routing only looks at the session's bind
+    replica_engine = create_async_engine(settings.db_url)
+    monkeypatch.setattr(database, "read_engine", replica_engine)
+    monkeypatch.setattr(database, "read_session_factory", async_sessionmaker(replica_engine))
+    monkeypatch.setattr(database, "recent_writers", TTLCache(100, READ_AFTER_WRITE_SECONDS))
+    return replica_engine
+
+
+def user_request(user_id: int) -> Request:
+    token = create_access_token(Payload(sub=str(user_id)))["access_token"]
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+async def read_bind(request: Request):
+    sessions = database.get_read_db(request)
+    session = await anext(sessions)
+    await sessions.aclose()
+    return session.bind
+
+
+async def write(request: Request):
+    sessions = database.get_db(request)
+    session = await anext(sessions)
+    await session.execute(text("SELECT 1"))
+    await session.commit()
+    with pytest.raises(StopAsyncIteration):
+        await anext(sessions)
+
+
+class NumberSchema(BaseSchema):
+    number: int
+
+
+async def streaming_bind(request: Request, replica):
+    """The engine that a stream of the request's read session queries once the session is closed."""
+    sessions = database.get_read_db(request)
+    response = stream_ndjson(text("SELECT 1 AS number").columns(), NumberSchema, await anext(sessions))
+    await sessions.aclose()
+    used = []
+    listeners = {bind: lambda *args, bind=bind: used.append(bind) for bind in (database.engine, replica)}
+    for bind, listener in listeners.items():
+        event.listen(bind.sync_engine, "before_cursor_execute", listener)
+    assert [chunk async for chunk in response.body_iterator] == ['{"number":1}\n']
+    for bind, listener in listeners.items():
+        event.remove(bind.sync_engine, "before_cursor_execute", listener)
+    return used
+
+
+async def test_reads_go_to_the_replica(replica):
+    assert await read_bind(user_request(1)) is replica
+    assert await read_bind(Request({"type": "http", "headers": []})) is replica
+
+
+async def test_recent_writer_reads_from_the_primary(replica):
+    await write(user_request(1))
+    assert await read_bind(user_request(1)) is database.engine
+    assert await read_bind(user_request(2)) is replica
+
+
+async def test_writer_returns_to_the_replica_after_the_window(replica):
+    await write(user_request(1))
+    await asyncio.sleep(READ_AFTER_WRITE_SECONDS * 2)
+    assert await read_bind(user_request(1)) is replica
+
+
+async def test_streams_follow_the_read_routing(replica):
+    assert await streaming_bind(user_request(1), replica) == [replica]
+    await write(user_request(1))
+    assert await streaming_bind(user_request(1), replica) == [database.engine]
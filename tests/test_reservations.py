@@ -0,0 +1,130 @@
+import asyncio
+import datetime as dt
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, select, false, func
+
+from src.api_routers.reservation import create_reservation
+from src.availability import book_batch
+from src.database import engine, session_factory
+from src.models import Reservation
+from src.models.reservation import BookingStatus
+from src.schemas.reservation import CreateReservationSchema
+
+pytestmark = [pytest.mark.asyncio]
+
+START = dt.datetime(2030, 12, 10, 12)
+
+
+@pytest.fixture
+def statements():
+    """What the primary's connections send to the server: the statements, and the BEGIN/COMMIT/ROLLBACK that
+    asyncpg issues on its own."""
+    sent = []
+
+    def log_statement(connection, cursor, statement, parameters, context, executemany):
+        sent.append(statement)
+
+    def log_transaction_control(record):
+        # asyncpg calls query loggers soon after the query, not during it
+        sent.append(record.query)
+
+    def add_logger(dbapi_connection, connection_record, connection_proxy):
+        dbapi_connection.driver_connection.add_query_logger(log_transaction_control)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", log_statement)
+    event.listen(engine.sync_engine, "checkout", add_logger)
+    yield sent
+    event.remove(engine.sync_engine, "before_cursor_execute", log_statement)
+    event.remove(engine.sync_engine, "checkout", add_logger)
+
+
+async def test_booking_is_one_statement_whatever_the_session_did_before(food_place, statements):
+    reservation_schema = CreateReservationSchema(start_datetime=START, duration_in_minutes=60,
+                                                 food_table_id=food_place.table_ids[0])
+    async with session_factory() as session:
+        # A dependency has already begun the request session's transaction
+        await session.execute(select(1))
+        statements.clear()
+        reservation = await create_reservation(reservation_schema, session, food_place.user_id)
+        await asyncio.sleep(0)
+        assert len(statements) == 1 and statements[0].startswith("WITH checks AS")
+    assert reservation.food_table_id == food_place.table_ids[0]
+    assert session.info["committed"]
+
+
+async def book(food_place, start_datetime: dt.datetime, food_table_id: int | None = None):
+    reservation_schema = CreateReservationSchema(start_datetime=start_datetime, duration_in_minutes=60,
+                                                 food_table_id=food_table_id or food_place.table_ids[0])
+    async with session_factory() as session:
+        return await create_reservation(reservation_schema, session, food_place.user_id)
+
+
+async def booking_error(food_place, start_datetime: dt.datetime, food_table_id: int | None = None) -> HTTPException:
+    with pytest.raises(HTTPException) as error:
+        await book(food_place, start_datetime, food_table_id)
+    return error.value
+
+
+@pytest.mark.parametrize("start_datetime", [START, START + dt.timedelta(minutes=30), START - dt.timedelta(minutes=30)])
+async def test_overlapping_booking_is_refused(food_place, start_datetime):
+    await book(food_place, START)
+    assert (await booking_error(food_place, start_datetime)).status_code == 400
+    await book(food_place, START + dt.timedelta(hours=1))
+
+
+async def test_booking_errors_map_to_statuses(food_place):
+    assert (await booking_error(food_place, START, food_table_id=-1)).status_code == 404
+    assert (await booking_error(food_place, START.replace(hour=21, minute=30))).status_code == 400
+
+
+async def test_exclusion_constraint_refuses_an_overlap_the_check_missed(food_place, monkeypatch):
+    await book(food_place, START)
+    # As if a concurrent booking had committed between the check and the insert
+    monkeypatch.setattr(Reservation, "overlapping", classmethod(lambda cls, start_datetime, end_datetime: false()))
+    assert (await booking_error(food_place, START + dt.timedelta(minutes=30))).status_code == 409
+
+
+@pytest.mark.parametrize("all_or_nothing", [False, True])
+async def test_batch_modes(food_place, all_or_nothing):
+    await book(food_place, START + dt.timedelta(hours=2))
+    first_table, second_table, _ = food_place.table_ids
+    items = [(START, 60, first_table), (START + dt.timedelta(minutes=30), 60, first_table),
+             (START + dt.timedelta(hours=2), 60, first_table), (START, 60, -1), (START, 60, second_table)]
+    async with session_factory() as session:
+        results = await book_batch(session, items, food_place.user_id, all_or_nothing)
+        await session.commit()
+        booked = await session.scalar(select(func.count()).where(Reservation.user_id == food_place.user_id))
+    booked_status = BookingStatus.NOT_BOOKED if all_or_nothing else BookingStatus.BOOKED
+    assert [result.status for result in results] == [
+        booked_status, BookingStatus.CONFLICTS_WITH_BATCH, BookingStatus.TIME_OCCUPIED, BookingStatus.TABLE_NOT_FOUND,
+        booked_status]
+    assert booked == (1 if all_or_nothing else 3)
+    if not all_or_nothing:
+        assert [result.food_place_id for result in results if result.reservation] == [food_place.id] * 2
+
+
+async def book_best_fit(food_place, seats: int):
+    async with session_factory() as session:
+        result = await Reservation.book_best_fit(session, food_place.id, seats, START, 60, food_place.user_id)
+        await session.commit()
+    return result
+
+
+async def test_best_fit_takes_the_smallest_free_table_that_seats_the_party(food_place):
+    _, four_seats, six_seats = food_place.table_ids
+    assert (await book_best_fit(food_place, 3)).reservation.food_table_id == four_seats
+    assert (await book_best_fit(food_place, 3)).reservation.food_table_id == six_seats
+    assert (await book_best_fit(food_place, 3)).status is BookingStatus.NO_FREE_TABLE
+    assert (await book_best_fit(food_place, 7)).status is BookingStatus.NO_FREE_TABLE
+
+
+async def test_best_fit_skips_a_table_taken_meanwhile(food_place, monkeypatch):
+    _, four_seats, six_seats = food_place.table_ids
+    await book(food_place, START, four_seats)
+    # The candidates still include the taken table, whose insert the exclusion constraint refuses
+    monkeypatch.setattr(Reservation, "overlapping", classmethod(lambda cls, start_datetime, end_datetime: false()))
+    result = await book_best_fit(food_place, 3)
+    assert result.status is BookingStatus.BOOKED and result.reservation.food_table_id == six_seats
+    assert result.food_place_id == food_place.id
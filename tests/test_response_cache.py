@@ -0,0 +1,82 @@
+from collections import Counter
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+
+from src import database
+from src.main import app
+from src.response_cache import ResponseCache, etag_matches
+from src.security import Payload, create_access_token
+
+
+def test_etag_matches_any_listed_or_weak_tag():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_invalidating_during_a_build_keeps_its_body_out():
+    cache = ResponseCache(10, 60)
+    started = cache.begin_build()
+    cache.invalidate("locations")
+    cache.put("/locations?", b"[]", ["locations"], started)
+    cache.end_build()
+    assert cache.get("/locations?") is None and cache.stale_builds == 1
+
+
+@pytest_asyncio.fixture
+async def client(food_place):
+    token = create_access_token(Payload(sub=str(food_place.user_id), adm=True))["access_token"]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        yield client
+
+
+@pytest.fixture
+def db_access():
+    """Connection checkouts and statements of the primary and read engines while the test runs."""
+    counts = Counter()
+
+    def checkout(*args):
+        counts["checkouts"] += 1
+
+    def before_cursor_execute(*args):
+        counts["statements"] += 1
+
+    engines = {database.engine.sync_engine, database.read_engine.sync_engine}
+    for engine in engines:
+        event.listen(engine, "checkout", checkout)
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield counts
+    for engine in engines:
+        event.remove(engine, "checkout", checkout)
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.asyncio
+async def test_not_modified_is_served_without_the_database(client, food_place, db_access):
+    url = f"/api/food_places/{food_place.id}/menu_items"
+    first = await client.get(url)
+    assert first.status_code == 200 and db_access["statements"]
+    db_access.clear()
+
+    response = await client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 304 and response.headers["ETag"] == first.headers["ETag"]
+    assert not response.content
+    assert not db_access
+
+
+@pytest.mark.asyncio
+async def test_writes_change_the_etag(client, food_place):
+    url = f"/api/food_places/{food_place.id}/menu_items"
+    first = await client.get(url)
+    created = await client.post("/api/menu_items", json={"name": "soup", "food_place_id": food_place.id,
+                                                         "price": "4.50"})
+    assert created.status_code == 200
+
+    response = await client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200 and response.headers["ETag"] != first.headers["ETag"]
+    assert [item["name"] for item in response.json()] == ["soup"]
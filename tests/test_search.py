@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+import pytest
+
+from src.config import settings
+from src.database import session_factory
+from src.models import MenuItem
+from src.search import search, prefix_tsquery, query_words, QueryTooBroadError, FUZZY_MODE
+
+
+def test_last_word_is_a_prefix_once_long_enough():
+    assert prefix_tsquery(query_words("Pepperoni piz")) == "pepperoni & piz:*"
+    assert prefix_tsquery(query_words("soup 9")) == "soup & 9"
+    assert prefix_tsquery(query_words("pizza, pizza!")) == "pizza:*"
+
+
+@pytest.mark.parametrize("query", ["ab", "a b c", "12 34", "!!"])
+def test_query_without_a_long_word_is_too_broad(query):
+    with pytest.raises(QueryTooBroadError):
+        query_words(query)
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_the_first_candidates_and_tell_truncation(food_place, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_MAX_CANDIDATES", 3)
+    async with session_factory() as session:
+        session.add_all([MenuItem(name=f"Pizza {number}", price=Decimal(5), food_place_id=food_place.id)
+                         for number in ("one", "two", "three", "four")])
+        await session.commit()
+
+        filters = (MenuItem.food_place_id == food_place.id,)
+        rows, cursor, truncated = await search(session, MenuItem, "pizz", None, 2, *filters)
+        assert len(rows) == 2 and cursor is not None and truncated
+        more, cursor, _ = await search(session, MenuItem, "pizz", cursor, 2, *filters)
+        assert len(more) == 1 and cursor is None
+        assert len({menu_item.id for menu_item, _ in rows + more}) == 3
+
+        rows, cursor, truncated = await search(session, MenuItem, "piza three", None, 10, *filters)
+    assert rows[0][0].name == "Pizza three" and not truncated
+    assert cursor is None or cursor.startswith(FUZZY_MODE)